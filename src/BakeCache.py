@@ -0,0 +1,136 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+CACHE_KEY_VERSION = 4 #Bump whenever a change to the bake makes older cached outputs stale
+STATS_FILE = ".stats.json" #Hit, miss and eviction totals of every process that used the cache
+STATS_LOCK = ".stats.lock"
+STALE_LOCK_SECONDS = 10 #A stats lock older than this was left behind by a process killed while holding it
+
+class BakeCache: #Size bounded on-disk store of baked outputs, keyed on a hash of everything that goes into a bake
+    def __init__(self, directory, maxBytes=4 << 30):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def Lookup(self, key, destination, filename): #Copies the cached outputs for key to destination, returns False on a miss
+        entryDirectory = os.path.join(self.directory, key)
+        entryPath = os.path.join(entryDirectory, "entry.json")
+        try:
+            with open(entryPath, "r") as file:
+                suffixes = json.load(file)["suffixes"]
+            for suffix in suffixes:
+                shutil.copyfile(os.path.join(entryDirectory, suffix), os.path.join(destination, filename + suffix))
+        except (OSError, ValueError, KeyError): #Missing, half evicted or corrupt entries all count as misses
+            self.RecordStat("misses")
+            return False
+
+        os.utime(entryPath) #The entry file's modification time is the last use for LRU eviction
+        self.RecordStat("hits")
+        return True
+
+    def Store(self, key, destination, filename, suffixes): #Adds the outputs destination/filename + suffix under key
+        os.makedirs(self.directory, exist_ok=True)
+        stagingDirectory = tempfile.mkdtemp(prefix=".staging_", dir=self.directory)
+        for suffix in suffixes:
+            shutil.copyfile(os.path.join(destination, filename + suffix), os.path.join(stagingDirectory, suffix))
+        with open(os.path.join(stagingDirectory, "entry.json"), "w") as file:
+            json.dump({"suffixes": list(suffixes), "created": time.time()}, file)
+
+        try: #Renaming the finished entry into place keeps concurrent batch workers from seeing partial entries
+            os.replace(stagingDirectory, os.path.join(self.directory, key))
+        except OSError: #Another worker stored the same key first
+            shutil.rmtree(stagingDirectory, ignore_errors=True)
+        self.Evict()
+
+    def Evict(self): #Removes least recently used entries until the cache fits in maxBytes
+        entries = []
+        totalBytes = 0
+        for key in os.listdir(self.directory):
+            entryDirectory = os.path.join(self.directory, key)
+            entryPath = os.path.join(entryDirectory, "entry.json")
+            if key.startswith(".") or not os.path.exists(entryPath):
+                continue
+            entryBytes = sum(os.path.getsize(os.path.join(entryDirectory, name)) for name in os.listdir(entryDirectory))
+            entries.append((os.path.getmtime(entryPath), entryBytes, entryDirectory))
+            totalBytes += entryBytes
+
+        for lastUsed, entryBytes, entryDirectory in sorted(entries):
+            if totalBytes <= self.maxBytes:
+                break
+            shutil.rmtree(entryDirectory, ignore_errors=True)
+            totalBytes -= entryBytes
+            self.RecordStat("evictions")
+
+    def RecordStat(self, name):
+        self.UpdateStats(name)
+
+    def GetStats(self): #Returns {"hits", "misses", "evictions"} counts summed over every process and run that used this directory
+        totals = {"hits": 0, "misses": 0, "evictions": 0}
+        totals.update(self.UpdateStats())
+        return totals
+
+    def UpdateStats(self, name=None): #Adds one to the name count when given and returns the totals
+        #Concurrent batch workers take turns under the lock so no count is lost, and the per-process files older versions wrote are folded in and removed
+        statsPath = os.path.join(self.directory, STATS_FILE)
+        with StatsLock(self.directory):
+            totals = ReadStats(statsPath)
+            processStats = [os.path.join(self.directory, fileName) for fileName in os.listdir(self.directory)
+                            if fileName.startswith(".stats.") and fileName.endswith(".json") and fileName != STATS_FILE]
+            for path in processStats:
+                for statName, count in ReadStats(path).items():
+                    totals[statName] = totals.get(statName, 0) + count
+            if name:
+                totals[name] = totals.get(name, 0) + 1
+            if name or processStats:
+                with open(statsPath + ".tmp", "w") as file:
+                    json.dump(totals, file)
+                os.replace(statsPath + ".tmp", statsPath)
+            for path in processStats:
+                os.remove(path)
+        return totals
+
+@contextlib.contextmanager
+def StatsLock(directory): #Creating a directory is atomic on every platform, so whoever creates the lock directory holds the lock
+    lockPath = os.path.join(directory, STATS_LOCK)
+    while True:
+        try:
+            os.mkdir(lockPath)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lockPath) > STALE_LOCK_SECONDS:
+                    os.rmdir(lockPath)
+                    continue
+            except OSError: #Released or broken by someone else in the meantime
+                continue
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        try:
+            os.rmdir(lockPath)
+        except OSError:
+            pass
+
+def ReadStats(path):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def HashFile(path, hasher): #Streams a file's contents into hasher
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            hasher.update(block)
+
+def BakeCacheKey(snapshot, settings): #Hash of a source MeshSnapshot, its texture contents and a list of bake settings
+    hasher = hashlib.sha256()
+    hasher.update(repr([CACHE_KEY_VERSION] + list(settings)).encode())
+    snapshot.Hash(hasher)
+    return hasher.hexdigest()
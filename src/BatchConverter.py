@@ -0,0 +1,270 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from BakeCache import BakeCache, BakeCacheKey
+from Dilation import MipPadding
+from MeshSnapshot import MeshSnapshot
+from Profiler import Profiler
+from TextureBaker import BakeSnapshot
+from TextureEncoder import OutputSuffixes
+from TiledBake import GetProcessContext
+from UVAtlas import GenerateAtlas
+
+SCENE_EXTENSIONS = (".ma", ".mb")
+MESH_EXTENSIONS = (".obj", ".fbx", ".gltf", ".glb", ".npz")
+SNAPSHOT_EXTENSIONS = (".obj", ".gltf", ".glb", ".npz") #Meshes MeshSnapshot reads without Maya
+DEFAULT_CONFIG = {
+    "resolution": 2048,
+    "outputDirectory": "",
+    "createUVs": False,
+    "nativeTransfer": True,
+    "tileSize": 0,
+    "workers": 0, #0 runs one worker per core
+    "cacheDirectory": "", #Unchanged assets are copied from this bake cache when set
+    "cacheSizeMB": 4096,
+    "uvPadding": 4,
+    "superSampling": 3, #Most samples per axis for border and high contrast texels, the rest get one
+    "dilation": 0, #Texels of edge padding around the baked uv charts
+    "dilationMipLevel": -1, #When 0 or more, overrides dilation with the padding that mip level needs
+    "outputFormat": "png", #png, or dds and ktx2 for block compressed maps with mip chains
+    "colorCompression": "bc1", #Color block format of dds and ktx2 outputs, bc3 keeps the coverage alpha
+    "normalBitDepth": 8, #16 writes 16-bit normal PNGs
+    "combineMeshes": False, #Bakes every mesh of a scene or glTF file into one shared atlas and one texture pair, needs nativeTransfer for scenes
+    "profile": False, #Writes a <output>_profile.json stage report next to every output
+}
+
+RUN_SETTINGS = ("workers", "cacheDirectory", "cacheSizeMB") #Change how a batch runs but never what it writes
+
+def LoadConfig(path): #Reads a JSON config on top of the defaults
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path, "r") as file:
+            config.update(json.load(file))
+    return config
+
+def FindAssets(inputDirectory, outputDirectory=""): #Every scene or exported mesh under inputDirectory, in a stable order
+    assets = []
+    for root, directories, files in os.walk(inputDirectory):
+        #Meshes written next to the outputs are never assets themselves, the default output directory sits inside the input
+        directories[:] = sorted(directory for directory in directories if os.path.join(root, directory) != outputDirectory)
+        for file in sorted(files):
+            if file.lower().endswith(SCENE_EXTENSIONS + MESH_EXTENSIONS):
+                assets.append(os.path.join(root, file))
+    return assets
+
+def GetAssetStamp(path, config): #An asset is considered unchanged while its size, modification time and the config it was converted with match
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "config": GetConfigHash(config)}
+
+def GetConfigHash(config): #Hash of every setting that changes the outputs
+    settings = {name: value for name, value in config.items() if name not in RUN_SETTINGS}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+def ReadManifest(manifestPath): #Returns {asset: entry} for every asset that finished in an earlier run
+    finished = {}
+    if not os.path.exists(manifestPath):
+        return finished
+    with open(manifestPath, "r") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError: #A run killed mid write leaves a partial last line behind
+                continue
+            if entry.get("status") == "done":
+                finished[entry["asset"]] = entry
+    return finished
+
+def AppendManifest(manifestPath, entry):
+    with open(manifestPath, "a") as file:
+        file.write(json.dumps(entry) + "\n")
+        file.flush()
+        os.fsync(file.fileno()) #Make sure a crash right after this asset still remembers it
+
+def GetOutputName(inputDirectory, assetPath): #Output file names are the asset path relative to the input directory
+    relativePath = os.path.splitext(os.path.relpath(assetPath, inputDirectory))[0]
+    return re.sub(r"\W+", "_", relativePath).strip("_")
+
+def NeedsMaya(assetPath, config): #Exported meshes baked with the native transfer never touch Maya
+    return not (config["nativeTransfer"] and assetPath.lower().endswith(SNAPSHOT_EXTENSIONS))
+
+def InitializeWorker(needsMaya): #Worker processes converting scenes run their own standalone Maya session
+    if needsMaya:
+        import maya.standalone
+        maya.standalone.initialize(name="python")
+
+def GetDilation(config): #Edge padding in texels from either dilation or dilationMipLevel
+    return MipPadding(config["dilationMipLevel"]) if config["dilationMipLevel"] >= 0 else config["dilation"]
+
+def ConvertAsset(assetPath, outputName, config): #Converts one asset inside a worker
+    if not NeedsMaya(assetPath, config):
+        return ConvertMeshFile(assetPath, outputName, config)
+    return ConvertMayaAsset(assetPath, outputName, config)
+
+def ConvertMeshFile(assetPath, outputName, config): #Maya-free conversion of an exported mesh through MeshSnapshot
+    startTime = time.time()
+    profiler = Profiler(config["profile"]) #Allocations are only tracked when a report is written, tracemalloc slows uv generation down several times
+    try:
+        with profiler.Stage("snapshot"):
+            meshes = MeshSnapshot.MeshesFromFile(assetPath)
+        shouldCreateUVs = config["createUVs"]
+        if config["combineMeshes"] and len(meshes) > 1: #The whole file is one atlas and one texture pair, otherwise every mesh gets its own
+            meshes = [("", MeshSnapshot.Combine([snapshot for name, snapshot in meshes]))]
+            shouldCreateUVs = True #The uvs of separate meshes overlap until they share an atlas, and only the written mesh has the uvs of the combined textures
+        cache = BakeCache(config["cacheDirectory"], config["cacheSizeMB"] << 20) if config["cacheDirectory"] else None
+        outputs = []
+        cachedOutputs = []
+        for name, source in meshes:
+            filename = outputName if len(meshes) == 1 else outputName + "_" + re.sub(r"\W+", "_", name)
+            target = source
+            if shouldCreateUVs: #Also laid out on a cache hit, the mesh written next to the textures needs the uvs they were baked for
+                with profiler.Stage("generateUVs"):
+                    uvs, uvIds = GenerateAtlas(source.positions, source.faceVertexCounts, source.faceVertexIds, int(config["resolution"]), config["uvPadding"],
+                                               triangleFaceVertices=source.triangleFaceVertices)
+                    target = source.WithUVs(uvs, uvIds)
+
+            cacheHit = False
+            if cache:
+                cacheKey = BakeCacheKey(source, [int(config["resolution"]), shouldCreateUVs, config["uvPadding"], True, config["superSampling"], GetDilation(config),
+                                                config["outputFormat"], config["colorCompression"], config["normalBitDepth"]])
+                with profiler.Stage("cacheLookup"):
+                    cacheHit = cache.Lookup(cacheKey, config["outputDirectory"], filename)
+
+            if cacheHit:
+                cachedOutputs.append(filename)
+            else:
+                BakeSnapshot(source, target, int(config["resolution"]), config["outputDirectory"], filename, config["tileSize"], 1, GetDilation(config), config["superSampling"], profiler,
+                             outputFormat=config["outputFormat"], colorCompression=config["colorCompression"], normalBitDepth=config["normalBitDepth"])
+                if cache:
+                    with profiler.Stage("cacheStore"):
+                        cache.Store(cacheKey, config["outputDirectory"], filename, OutputSuffixes(config["outputFormat"]))
+
+            outputs += [filename + suffix for suffix in OutputSuffixes(config["outputFormat"])]
+            if shouldCreateUVs:
+                with profiler.Stage("writeMesh"):
+                    outputs += WriteBakedMesh(target, assetPath, filename, config)
+
+        if config["profile"]:
+            profiler.WriteReport(os.path.join(config["outputDirectory"], outputName + "_profile.json"), source=assetPath, cacheHit=len(cachedOutputs) == len(meshes), **config)
+        return {"outputs": outputs, "cached": cachedOutputs, "seconds": time.time() - startTime}
+    finally:
+        profiler.Stop()
+
+def WriteBakedMesh(target, assetPath, outputName, config): #Writes the re-uv'd mesh with one material using the baked textures, returns its file names
+    colorSuffix, normalSuffix = OutputSuffixes(config["outputFormat"])
+    if assetPath.lower().endswith(".npz"): #Snapshots are read back without resolving paths, so they keep absolute ones
+        colorTexture, normalTexture = (os.path.join(config["outputDirectory"], outputName + suffix) for suffix in (colorSuffix, normalSuffix))
+        target.WithMaterial(outputName, colorTexture, normalTexture).Save(os.path.join(config["outputDirectory"], outputName + ".npz"))
+        return [outputName + ".npz"]
+    #OBJ and glTF inputs are written as OBJ, the .mtl sits next to the textures so it names them relatively
+    target.WithMaterial(outputName, outputName + colorSuffix, outputName + normalSuffix).SaveObj(os.path.join(config["outputDirectory"], outputName + ".obj"))
+    return [outputName + ".obj", outputName + ".mtl"]
+
+def ConvertMayaAsset(assetPath, outputName, config): #Runs the combiner on every mesh of a scene or imported mesh
+    import maya.cmds as mc
+    from TextureCombiner import TextureCombiner
+
+    startTime = time.time()
+    if assetPath.lower().endswith(SCENE_EXTENSIONS):
+        mc.file(assetPath, open=True, force=True)
+    else:
+        mc.file(new=True, force=True)
+        mc.loadPlugin("objExport" if assetPath.lower().endswith(".obj") else "fbxmaya", quiet=True)
+        mc.file(assetPath, i=True)
+
+    meshes = sorted(set(mc.listRelatives(mc.ls(type="mesh", noIntermediate=True), parent=True) or []))
+    cache = BakeCache(config["cacheDirectory"], config["cacheSizeMB"] << 20) if config["cacheDirectory"] else None
+    outputs = []
+    cachedOutputs = []
+    #With combineMeshes the whole scene is one combiner run, otherwise every mesh gets its own
+    groups = [meshes] if config["combineMeshes"] and meshes else [[mesh] for mesh in meshes]
+    for group in groups:
+        filename = outputName if len(groups) == 1 else outputName + "_" + re.sub(r"\W+", "_", group[0])
+        textureCombiner = TextureCombiner(config["resolution"], config["outputDirectory"], filename)
+        textureCombiner.source = group[0]
+        if len(group) > 1:
+            textureCombiner.sources = group
+            textureCombiner.ReadAtlasWeights()
+        textureCombiner.tileSize = config["tileSize"]
+        textureCombiner.workerCount = 1 #The batch already keeps every core busy with whole assets
+        textureCombiner.uvPadding = config["uvPadding"]
+        textureCombiner.dilation = GetDilation(config)
+        textureCombiner.superSampling = config["superSampling"]
+        textureCombiner.outputFormat = config["outputFormat"]
+        textureCombiner.colorCompression = config["colorCompression"]
+        textureCombiner.normalBitDepth = config["normalBitDepth"]
+        textureCombiner.cache = cache
+        if config["profile"]:
+            textureCombiner.reportPath = os.path.join(config["outputDirectory"], filename + "_profile.json")
+        if textureCombiner.Run(config["createUVs"], config["nativeTransfer"]):
+            cachedOutputs.append(filename)
+        outputs += [filename + suffix for suffix in OutputSuffixes(config["outputFormat"])]
+        if config["createUVs"] or len(group) > 1: #The duplicates carry the new uvs, exported in the format the asset came in
+            meshFilename = filename + os.path.splitext(assetPath)[1].lower()
+            textureCombiner.ExportTargets(os.path.join(config["outputDirectory"], meshFilename))
+            outputs.append(meshFilename)
+
+    return {"outputs": outputs, "cached": cachedOutputs, "seconds": time.time() - startTime}
+
+def RunBatch(inputDirectory, config, manifestPath):
+    os.makedirs(config["outputDirectory"], exist_ok=True)
+    finished = ReadManifest(manifestPath)
+
+    pending = []
+    for assetPath in FindAssets(inputDirectory, config["outputDirectory"]):
+        asset = os.path.relpath(assetPath, inputDirectory)
+        entry = finished.get(asset)
+        if entry and entry["stamp"] == GetAssetStamp(assetPath, config):
+            continue
+        pending.append(assetPath)
+    print(f"{len(pending)} assets to convert, {len(finished)} already in {manifestPath}")
+
+    failures = 0
+    workers = config["workers"] or os.cpu_count() or 1
+    needsMaya = any(NeedsMaya(assetPath, config) for assetPath in pending)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=GetProcessContext(), initializer=InitializeWorker, initargs=(needsMaya,)) as executor:
+        futures = {executor.submit(ConvertAsset, assetPath, GetOutputName(inputDirectory, assetPath), config): assetPath for assetPath in pending}
+        for future in as_completed(futures):
+            assetPath = futures[future]
+            entry = {"asset": os.path.relpath(assetPath, inputDirectory), "stamp": GetAssetStamp(assetPath, config)}
+            try:
+                entry.update(future.result())
+                entry["status"] = "done"
+                print(f"Converted {assetPath} in {entry['seconds']:.1f}s")
+            except Exception as e: #Failed assets are recorded but retried on the next run
+                entry["status"] = "failed"
+                entry["error"] = f"{e}"
+                failures += 1
+                print(f"Failed {assetPath}: {e}")
+            AppendManifest(manifestPath, entry)
+
+    if config["cacheDirectory"]:
+        print(f"Bake cache: {BakeCache(config['cacheDirectory']).GetStats()}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert every scene or exported mesh in a directory into combined color and normal textures.")
+    parser.add_argument("inputDirectory", help="Directory searched recursively for .ma, .mb, .obj, .fbx, .gltf, .glb and .npz files")
+    parser.add_argument("--config", help="JSON file with resolution, outputDirectory, createUVs, nativeTransfer, tileSize, workers, cacheDirectory, cacheSizeMB, uvPadding, superSampling, dilation, dilationMipLevel, outputFormat, colorCompression, normalBitDepth, combineMeshes and profile")
+    parser.add_argument("--output", help="Output directory, overrides the config")
+    parser.add_argument("--workers", type=int, help="Number of worker processes, overrides the config")
+    parser.add_argument("--manifest", help="Manifest of finished assets, defaults to manifest.jsonl in the output directory")
+    args = parser.parse_args()
+
+    config = LoadConfig(args.config)
+    if args.output:
+        config["outputDirectory"] = args.output
+    if args.workers:
+        config["workers"] = args.workers
+    config["outputDirectory"] = os.path.abspath(config["outputDirectory"] or os.path.join(args.inputDirectory, "converted"))
+    manifestPath = args.manifest or os.path.join(config["outputDirectory"], "manifest.jsonl")
+
+    failures = RunBatch(os.path.abspath(args.inputDirectory), config, manifestPath)
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from ImageIO import QuantizeImage, WritePng
+from MeshSnapshot import MeshSnapshot
+from Profiler import Profiler
+from TextureBaker import BakeSnapshot
+from UVAtlas import GenerateAtlas
+
+def SyntheticMesh(triangleCount, materialCount, textureDirectory, textureSize=512, seed=0):
+    #Bumpy torus of quads with about triangleCount triangles split into materialCount bands with their own textures
+    rng = np.random.default_rng(seed)
+    rows = max(int(np.sqrt(triangleCount / 8.0)), 3)
+    columns = max(int(round(triangleCount / (2.0 * rows))), 3)
+
+    #Torus grid, the last row and column wrap around to the first
+    u = np.arange(columns) / columns * 2.0 * np.pi
+    v = np.arange(rows) / rows * 2.0 * np.pi
+    tube = 1.0 + 0.05 * rng.standard_normal((rows, columns)) #Noise keeps the surface from being one big smooth chart
+    ring = 3.0 + tube * np.cos(v)[:, None]
+    positions = np.stack((ring * np.cos(u)[None, :], tube * np.sin(v)[:, None] * np.ones((1, columns)), ring * np.sin(u)[None, :]), axis=-1).reshape(-1, 3)
+
+    row, column = np.meshgrid(np.arange(rows), np.arange(columns), indexing="ij")
+    nextRow = (row + 1) % rows
+    nextColumn = (column + 1) % columns
+    faceVertexIds = np.stack((row * columns + column, row * columns + nextColumn, nextRow * columns + nextColumn, nextRow * columns + column), axis=-1).reshape(-1)
+    faceVertexCounts = np.full(rows * columns, 4)
+
+    #Source uvs tile the grid without wrapping so the seams have their own uvs
+    uvRow, uvColumn = np.meshgrid(np.arange(rows + 1), np.arange(columns + 1), indexing="ij")
+    uvs = np.column_stack((uvColumn.ravel() / columns, uvRow.ravel() / rows))
+    faceVertexUVIds = np.stack((row * (columns + 1) + column, row * (columns + 1) + column + 1, (row + 1) * (columns + 1) + column + 1, (row + 1) * (columns + 1) + column), axis=-1).reshape(-1)
+
+    materialIds = (np.arange(rows * columns) * materialCount) // (rows * columns)
+    materials = []
+    for materialId in range(materialCount):
+        colorPath = os.path.join(textureDirectory, f"material{materialId}_color.png")
+        normalPath = os.path.join(textureDirectory, f"material{materialId}_normal.png")
+        y, x = np.mgrid[0:textureSize, 0:textureSize] / textureSize
+        #Smooth stripes and flat cells with hard edges, like painted textures, so only edges and borders need supersampling
+        stripes = 0.5 + 0.5 * np.sin((x + y * (materialId + 1)) * 8.0)
+        cells = rng.random((8, 8))[(y * 8).astype(int), (x * 8).astype(int)]
+        color = np.stack((stripes, cells, np.full_like(x, materialId / max(materialCount, 1))), axis=-1)
+        WritePng(colorPath, QuantizeImage(color))
+        normal = np.stack((0.5 + 0.2 * np.cos(x * 12.0), 0.5 + 0.2 * np.sin(y * 12.0), np.ones_like(x)), axis=-1)
+        WritePng(normalPath, QuantizeImage(normal))
+        materials.append((f"material{materialId}", (0.5, 0.5, 0.5), colorPath, normalPath))
+
+    return MeshSnapshot(positions, faceVertexCounts, faceVertexIds, uvs, faceVertexUVIds, materialIds, materials)
+
+def RunCase(triangleCount, materialCount, resolution, settings, repeats=1): #Best of repeats stage timings for one mesh size
+    workDirectory = tempfile.mkdtemp(prefix="textureCombinerBenchmark_")
+    try:
+        source = SyntheticMesh(triangleCount, materialCount, workDirectory)
+        best = None
+        for _ in range(repeats):
+            profiler = Profiler(settings["trackAllocations"])
+            with profiler.Stage("generateUVs"):
+                uvs, uvIds = GenerateAtlas(source.positions, source.faceVertexCounts, source.faceVertexIds, resolution, settings["uvPadding"],
+                                           triangleFaceVertices=source.triangleFaceVertices)
+                target = source.WithUVs(uvs, uvIds)
+            BakeSnapshot(source, target, resolution, workDirectory, "benchmark", settings["tileSize"], settings["workers"], settings["dilation"], settings["superSampling"], profiler)
+            report = profiler.Report()
+            profiler.Stop()
+            if best is None or report["wallSeconds"] < best["wallSeconds"]:
+                best = report
+    finally:
+        shutil.rmtree(workDirectory, ignore_errors=True)
+
+    return {"triangles": len(source.triangleFaceVertices), "materials": materialCount, "resolution": resolution, "wallSeconds": best["wallSeconds"],
+            "cpuSeconds": best["cpuSeconds"], "maxRssBytes": best["maxRssBytes"], "childMaxRssBytes": best["childMaxRssBytes"], "peakAllocatedBytes": best["peakAllocatedBytes"],
+            "stages": best["totals"]}
+
+def CaseKey(case):
+    return f"{case['triangles']}tris_{case['materials']}mats_{case['resolution']}px"
+
+def CompareToBaseline(cases, baseline, tolerance, minimumSeconds=0.05):
+    #Returns (case, stage, baseline seconds, current seconds) for every stage that got slower than tolerance allows
+    baselineCases = {CaseKey(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in cases:
+        baselineCase = baselineCases.get(CaseKey(case))
+        if baselineCase is None:
+            continue
+        for stage, seconds in list(case["stages"].items()) + [("total", case["wallSeconds"])]:
+            baselineSeconds = baselineCase["wallSeconds"] if stage == "total" else baselineCase["stages"].get(stage)
+            if baselineSeconds is None:
+                continue
+            #Stages too short to time reliably only count once they slow down by minimumSeconds
+            if seconds > baselineSeconds * (1.0 + tolerance) and seconds - baselineSeconds > minimumSeconds:
+                regressions.append((CaseKey(case), stage, baselineSeconds, seconds))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Times the native texture transfer on synthetic meshes and compares the results against a stored baseline.")
+    parser.add_argument("--triangles", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--materials", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[1024, 2048])
+    parser.add_argument("--tile-size", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--super-sampling", type=int, default=3)
+    parser.add_argument("--dilation", type=int, default=8)
+    parser.add_argument("--uv-padding", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per case, the fastest one is kept")
+    parser.add_argument("--track-allocations", action="store_true", help="Records per-stage tracemalloc peaks, which slows allocation heavy stages like uv generation down several times")
+    parser.add_argument("--output", help="Writes the results as JSON, usable as a later baseline")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown over the baseline, 0.2 allows 20%%")
+    args = parser.parse_args()
+
+    settings = {"tileSize": args.tile_size, "workers": args.workers, "superSampling": args.super_sampling, "dilation": args.dilation,
+                "uvPadding": args.uv_padding, "trackAllocations": args.track_allocations}
+    cases = []
+    for triangleCount, materialCount, resolution in itertools.product(args.triangles, args.materials, args.resolutions):
+        case = RunCase(triangleCount, materialCount, resolution, settings, args.repeats)
+        cases.append(case)
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in case["stages"].items())
+        print(f"{CaseKey(case)}: {case['wallSeconds']:.2f}s ({stages})")
+
+    results = {"settings": settings, "cases": cases}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            regressions = CompareToBaseline(cases, json.load(file), args.tolerance)
+        for caseKey, stage, baselineSeconds, seconds in regressions:
+            print(f"Regression in {caseKey} {stage}: {baselineSeconds:.2f}s -> {seconds:.2f}s")
+        raise SystemExit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
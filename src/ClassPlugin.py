@@ -4,7 +4,6 @@ from maya.OpenMaya import MVector
 import maya.OpenMayaUI as OpenMayaUI #Import Maya UI module
 import shiboken2 #Import shoken2
 import maya.cmds as mc #Import maya commands
-import maya.mel as mel
 
 def GetMayaMainWindow()->QMainWindow: #Defines the GetMayaMainWindow() function that returns QMainWindow
     mainWindow = OpenMayaUI.MQtUtil.mainWindow() #Instantiate a mainWindow() class and assign to mainWindow
@@ -33,13 +32,15 @@ class LimbRigger: #Define LimbRigger class
 
     def FindJointsBasedOnSelection(self): #Define the FindJointsBasedOnSelection function
         try: #Check for errors
-            self.root = mc.ls(sl=True, type="joint")[0] #Gets currently selected joint and assigns it to root
-
-            self.mid = mc.listRelatives(self.root, c=True, type="joint")[0] #gets first child of root and assigns it to mid
-            self.end = mc.listRelatives(self.mid, c=True, type="joint")[0] #gets first child of mid and assigns it to end
+            self.FindJointsFromRoot(mc.ls(sl=True, type="joint")[0]) #Gets currently selected joint and uses it as root
         except Exception as e: #Handle errors
             raise Exception("Invalid Selection, please select the first joint of the limb") #Display error 
 
+    def FindJointsFromRoot(self, root): #Assigns root and its first child and grandchild joints as the limb
+        self.root = root
+        self.mid = mc.listRelatives(self.root, c=True, type="joint")[0] #gets first child of root and assigns it to mid
+        self.end = mc.listRelatives(self.mid, c=True, type="joint")[0] #gets first child of mid and assigns it to end
+
     def CreateFKControllerForJoint(self, jntName): #Define CreateFKControllerForJoint Function
         ctrlName = "ac_L_fk_" + jntName #Set control name to prefix + jntName
         ctrlGrpName = ctrlName + "_grp" #Set group name to ctrlName + suffix
@@ -50,15 +51,15 @@ class LimbRigger: #Define LimbRigger class
         return ctrlName, ctrlGrpName #Return control and control group
     
     def CreateBoxController(self, name):
-        mel.eval(f"curve -n {name} -d 1 -p -0.5 0.5 0.5 -p 0.5 0.5 0.5 -p 0.5 0.5 -0.5 -p -0.5 0.5 -0.5 -p -0.5 0.5 0.5 -p -0.5 -0.5 0.5 -p 0.5 -0.5 0.5 -p 0.5 0.5 0.5 -p 0.5 -0.5 0.5 -p 0.5 -0.5 -0.5 -p 0.5 0.5 -0.5 -p 0.5 -0.5 -0.5 -p -0.5 -0.5 -0.5 -p -0.5 0.5 -0.5 -p -0.5 -0.5 -0.5 -p -0.5 -0.5 0.5 -k 0 -k 1 -k 2 -k 3 -k 4 -k 5 -k 6 -k 7 -k 8 -k 9 -k 10 -k 11 -k 12 -k 13 -k 14 -k 15")
-        mc.scale(self.controllerSize, self.controllerSize, self.controllerSize, name)
-        mc.makeIdentity(name, apply = True) # Freeze transform
+        points = [(-0.5, 0.5, 0.5), (0.5, 0.5, 0.5), (0.5, 0.5, -0.5), (-0.5, 0.5, -0.5), (-0.5, 0.5, 0.5), (-0.5, -0.5, 0.5), (0.5, -0.5, 0.5), (0.5, 0.5, 0.5),
+                  (0.5, -0.5, 0.5), (0.5, -0.5, -0.5), (0.5, 0.5, -0.5), (0.5, -0.5, -0.5), (-0.5, -0.5, -0.5), (-0.5, 0.5, -0.5), (-0.5, -0.5, -0.5), (-0.5, -0.5, 0.5)]
+        mc.curve(n=name, d=1, p=[(x * self.controllerSize, y * self.controllerSize, z * self.controllerSize) for x, y, z in points]) #Points are scaled up front, nothing to freeze
         grpName = name + "_grp"
         mc.group(name, n = grpName)
         return name, grpName
 
     def CreatePlusController(self, name):
-        mel.eval(f"curve -n {name} -d 1 -p -1 1 0 -p -1 3 0 -p 1 3 0 -p 1 1 0 -p 3 1 0 -p 3 -1 0 -p 1 -1 0 -p 1 -3 0 -p -1 -3 0 -p -1 -1 0 -p -3 -1 0 -p -3 1 0 -p -1 1 0 -k 0 -k 1 -k 2 -k 3 -k 4 -k 5 -k 6 -k 7 -k 8 -k 9 -k 10 -k 11 -k 12 ;")
+        mc.curve(n=name, d=1, p=[(-1, 1, 0), (-1, 3, 0), (1, 3, 0), (1, 1, 0), (3, 1, 0), (3, -1, 0), (1, -1, 0), (1, -3, 0), (-1, -3, 0), (-1, -1, 0), (-3, -1, 0), (-3, 1, 0), (-1, 1, 0)])
         grpName = name + "_grp"
         mc.group(name, n = grpName)
         return name, grpName
@@ -113,9 +114,30 @@ class LimbRigger: #Define LimbRigger class
         mc.addAttr(ikfkBlendCtrl, ln=ikfkBlendAttrName, min=0, max=1, k=True)
         ikfkBlendAttr = ikfkBlendCtrl + "." + ikfkBlendAttrName
 
-        mc.expression(s=f"{ikHandleName}.ikBlend={ikfkBlendAttr}")
+        #Direct connections instead of an expression, so nothing has to run a script every evaluation
+        mc.connectAttr(ikfkBlendAttr, ikHandleName + ".ikBlend")
+        fkWeightAttr, ikWeightAttr = mc.orientConstraint(endOrientConstraint, q=True, weightAliasList=True) #FK controller was added to the constraint first
+        mc.connectAttr(ikfkBlendAttr, endOrientConstraint + "." + ikWeightAttr)
+        ikfkReverse = mc.createNode("reverse", n="ikfk_reverse_" + self.root)
+        mc.connectAttr(ikfkBlendAttr, ikfkReverse + ".inputX")
+        mc.connectAttr(ikfkReverse + ".outputX", endOrientConstraint + "." + fkWeightAttr)
         #TODO: Finish Lecture from this point
-        
+
+    def RigSelectedLimbs(self): #Rigs the limb starting at every selected joint as a single undo step
+        roots = mc.ls(sl=True, type="joint")
+        if not roots:
+            raise Exception("Invalid Selection, please select the first joint of every limb")
+        mc.undoInfo(openChunk=True, chunkName="RigSelectedLimbs")
+        mc.refresh(suspend=True) #Skip viewport redraws between the many small edits
+        try:
+            for root in roots:
+                self.FindJointsFromRoot(root)
+                self.RigLimb()
+        finally: #Always close the chunk, otherwise every later edit joins it
+            mc.refresh(suspend=False)
+            mc.undoInfo(closeChunk=True)
+        return roots
+
 
 class LimbRiggerWidget(MayaWindow): #Define LimbRiggerWidget
     def __init__(self): #Initializer
@@ -155,10 +177,21 @@ class LimbRiggerWidget(MayaWindow): #Define LimbRiggerWidget
         rigLimbButton.clicked.connect(lambda : self.rigger.RigLimb()) #Register RigLimb function to button clicked event
         self.masterLayout.addWidget(rigLimbButton) #Add widget to master layout
 
+        rigSelectedLimbsButton = QPushButton("Rig Selected Limbs") #Rigs every selected limb in one undo step
+        rigSelectedLimbsButton.clicked.connect(self.RigSelectedLimbsButtonClicked)
+        self.masterLayout.addWidget(rigSelectedLimbsButton)
+
     def CtrlSizeSliderChanged(self, newValue):
         self.ctrlSizeLabel.setText(f"{newValue}")
         self.rigger.controllerSize = newValue
 
+    def RigSelectedLimbsButtonClicked(self):
+        try:
+            roots = self.rigger.RigSelectedLimbs()
+            self.jointsListLineEdit.setText(",".join(roots))
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"{e}")
+
     def AutoFindJointButtonClicked(self): #Define AutoFindJointButtonClicked
         try: #Check for exception
             self.rigger.FindJointsBasedOnSelection() #Get joints based on currently selected joint. Calls the function from our rigger class
@@ -0,0 +1,104 @@
+import numpy as np
+
+NEIGHBOUR_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+def MipPadding(mipLevel): #Texels of padding that keep one texel of padding down to the given mip level
+    return 1 << mipLevel
+
+def DilateMaps(colorMap, normalMap, padding, coverage=None, stripHeight=1024):
+    #Fills every uncovered texel within padding texels of the uv coverage with its nearest covered texel, in place
+    #colorMap (H, W, C) and normalMap (H, W, 3) may be memmaps, they are processed in strips of stripHeight rows
+    #Coverage defaults to the alpha channel of the color map, which is left untouched so strips never see filled texels as seeds
+    if padding <= 0:
+        return
+    height = colorMap.shape[0]
+    reach = 2 * JumpFloodStep(padding) #Furthest a jump flood with steps up to JumpFloodStep(padding) can look
+    for stripStart in range(0, height, stripHeight):
+        stripEnd = min(stripStart + stripHeight, height)
+        haloStart = max(stripStart - reach, 0)
+        haloEnd = min(stripEnd + reach, height)
+        mask = np.asarray(coverage[haloStart:haloEnd] if coverage is not None else colorMap[haloStart:haloEnd, :, 3]) > 0
+        if mask.all() or not mask.any():
+            continue
+
+        texels, sources = NearestCoveredTexels(mask, padding)
+        width = mask.shape[1]
+        texelY = texels // width
+        inStrip = (texelY >= stripStart - haloStart) & (texelY < stripEnd - haloStart)
+        if not inStrip.any():
+            continue
+        targetY = texelY[inStrip] + haloStart
+        targetX = texels[inStrip] % width
+        sourceY = sources[inStrip] // width + haloStart
+        sourceX = sources[inStrip] % width
+
+        channels = 3 if colorMap.shape[2] == 4 else colorMap.shape[2] #Alpha keeps marking the real coverage
+        colorMap[targetY, targetX, :channels] = colorMap[sourceY, sourceX, :channels]
+        if normalMap is not None:
+            normalMap[targetY, targetX] = RenormalizeNormals(normalMap[sourceY, sourceX])
+
+def JumpFloodStep(padding): #Largest jump flood step needed to reach padding texels
+    return 1 << max(int(np.ceil(np.log2(max(padding, 1)))), 0)
+
+def NearestCoveredTexels(mask, padding):
+    #Jump flood over the uncovered texels within padding of the coverage
+    #Returns (flat ids of those texels that are within padding, flat id of the nearest covered texel to each)
+    height, width = mask.shape
+    texels = np.flatnonzero(GrowMask(mask, padding) & ~mask)
+    texelY, texelX = np.divmod(texels, width)
+    nearest = np.where(mask.ravel(), np.arange(height * width), -1) #Flat id of the best seed found by every texel so far
+    best = np.full(len(texels), -1)
+    bestDistance = np.full(len(texels), np.iinfo(np.int64).max)
+
+    step = JumpFloodStep(padding)
+    steps = []
+    while step >= 1:
+        steps.append(step)
+        step //= 2
+    steps.append(1) #One extra single texel pass fixes most of the jump flood's misses
+
+    for step in steps:
+        for offsetY, offsetX in NEIGHBOUR_OFFSETS:
+            #Every texel looks at the seed its neighbour step texels away has found
+            neighbourY = texelY + offsetY * step
+            neighbourX = texelX + offsetX * step
+            valid = np.flatnonzero((neighbourY >= 0) & (neighbourY < height) & (neighbourX >= 0) & (neighbourX < width))
+            seeds = nearest[neighbourY[valid] * width + neighbourX[valid]]
+            seedY, seedX = np.divmod(seeds, width)
+            distance = (seedY - texelY[valid]) ** 2 + (seedX - texelX[valid]) ** 2
+            better = (seeds >= 0) & (distance < bestDistance[valid])
+            best[valid[better]] = seeds[better]
+            bestDistance[valid[better]] = distance[better]
+            nearest[texels[valid[better]]] = seeds[better] #Seeds spread within a pass as well as between passes
+
+    withinPadding = bestDistance <= padding * padding
+    return texels[withinPadding], best[withinPadding]
+
+def GrowMask(mask, radius): #Grows a boolean mask by radius texels in every direction, as a square
+    grown = mask.copy()
+    for axis in (0, 1):
+        size = grown.shape[axis]
+        reached = 0
+        while reached < radius:
+            shift = min(reached + 1, radius - reached, size - 1) #Doubling shifts keep the grown runs contiguous
+            if shift <= 0:
+                break
+            shifted = grown.copy()
+            if axis == 0:
+                shifted[shift:] |= grown[:-shift]
+                shifted[:-shift] |= grown[shift:]
+            else:
+                shifted[:, shift:] |= grown[:, :-shift]
+                shifted[:, :-shift] |= grown[:, shift:]
+            grown = shifted
+            reached += shift
+    return grown
+
+def RenormalizeNormals(encodedNormals): #Decodes 0-1 or integer encoded normals, renormalizes them and encodes them again
+    maxValue = np.iinfo(encodedNormals.dtype).max if encodedNormals.dtype.kind in "ui" else 1.0
+    normals = encodedNormals.astype(np.float32) / maxValue * 2.0 - 1.0
+    normals /= np.maximum(np.linalg.norm(normals, axis=-1, keepdims=True), 1e-6)
+    encoded = (normals * 0.5 + 0.5) * maxValue
+    if encodedNormals.dtype.kind in "ui":
+        return np.clip(encoded + 0.5, 0, maxValue).astype(encodedNormals.dtype)
+    return encoded.astype(encodedNormals.dtype)
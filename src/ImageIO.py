@@ -0,0 +1,68 @@
+import ctypes
+import struct
+import zlib
+
+import numpy as np
+
+def ReadImage(path): #Reads an image file or file object into a uint8 (height, width, channels) array, uint16 for 16-bit grayscale files
+    try: #Prefer Pillow when it is installed, it reads every format we care about outside of Maya
+        from PIL import Image
+    except ImportError: #Fall back to Maya's image reader, which only reads files on disk
+        if not isinstance(path, str):
+            raise RuntimeError("Reading images embedded in mesh files needs Pillow")
+        return ReadImageWithMaya(path)
+
+    with Image.open(path) as image:
+        if image.mode.startswith("I;16"): #Pillow only keeps the full precision of 16-bit images for a single channel
+            return np.repeat(np.asarray(image).astype(np.uint16)[:, :, None], 3, axis=2)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        return np.array(image)
+
+def CanReadImagesOffMainThread(): #Pillow decodes on any thread, Maya's MImage fallback only on the main one
+    try:
+        import PIL
+    except ImportError:
+        return False
+    return True
+
+def ReadImageWithMaya(path): #Reads an image through MImage, which is always 8-bit RGBA stored bottom row first
+    import maya.api.OpenMaya as om
+
+    image = om.MImage()
+    image.readFromFile(path)
+    width, height = image.getSize()
+    buffer = (ctypes.c_ubyte * (width * height * 4)).from_address(int(image.pixels()))
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 4)[::-1].copy() #The buffer belongs to the MImage
+
+def QuantizeImage(image, bitDepth=8): #Converts a 0-1 float image into integer pixels of the given bit depth
+    maxValue = (1 << bitDepth) - 1
+    dtype = np.uint8 if bitDepth == 8 else np.uint16
+    return np.clip(image * maxValue + 0.5, 0, maxValue).astype(dtype)
+
+def WritePng(path, pixels): #Writes a (height, width, channels) uint8 or uint16 array as a PNG file
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    height, width, channels = pixels.shape
+    bitDepth = 16 if pixels.dtype == np.uint16 else 8
+    colorType = {1: 0, 2: 4, 3: 2, 4: 6}[channels] #Gray, gray alpha, RGB, RGBA
+
+    with open(path, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        WritePngChunk(file, b"IHDR", struct.pack(">IIBBBBB", width, height, bitDepth, colorType, 0, 0, 0))
+
+        compressor = zlib.compressobj(6)
+        compressed = []
+        for row in pixels:
+            rowBytes = row.astype(">u2").tobytes() if bitDepth == 16 else row.tobytes()
+            compressed.append(compressor.compress(b"\x00" + rowBytes)) #Filter type 0 (none) for every row
+        compressed.append(compressor.flush())
+
+        WritePngChunk(file, b"IDAT", b"".join(compressed))
+        WritePngChunk(file, b"IEND", b"")
+
+def WritePngChunk(file, chunkType, data):
+    file.write(struct.pack(">I", len(data)))
+    file.write(chunkType)
+    file.write(data)
+    file.write(struct.pack(">I", zlib.crc32(chunkType + data) & 0xFFFFFFFF))
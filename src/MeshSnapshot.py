@@ -0,0 +1,535 @@
+import base64
+import io
+import json
+import os
+import struct
+
+import numpy as np
+from BakeCache import HashFile
+from ImageIO import ReadImage
+from TextureTransfer import MaterialTextures, TangentFrames
+
+GLTF_COMPONENT_TYPES = {5120: np.int8, 5121: np.uint8, 5122: np.int16, 5123: np.uint16, 5125: np.uint32, 5126: np.float32}
+GLTF_TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+
+class MeshSnapshot: #Array-backed copy of a mesh and its materials so every later step can run outside of Maya
+    __slots__ = ("positions", "normals", "tangents", "faceVertexCounts", "faceVertexIds", "uvs", "faceVertexUVIds", "triangleFaceVertices", "materialIds", "materials", "shadingEngines", "shadingHistories", "embeddedImages", "materialTextures")
+
+    def __init__(self, positions, faceVertexCounts, faceVertexIds, uvs, faceVertexUVIds, materialIds, materials, normals=None, tangents=None, triangleFaceVertices=None, shadingEngines=None, embeddedImages=None):
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3) #(V, 3) vertex positions
+        self.faceVertexCounts = np.asarray(faceVertexCounts, dtype=np.int32) #(F,) vertices per polygon
+        self.faceVertexIds = np.asarray(faceVertexIds, dtype=np.int32) #(FV,) vertex id of every face-vertex
+        self.uvs = np.asarray(uvs, dtype=np.float32).reshape(-1, 2) #(U, 2) uv table
+        self.faceVertexUVIds = np.asarray(faceVertexUVIds, dtype=np.int32) #(FV,) uv id of every face-vertex, -1 when unassigned
+        self.materialIds = np.asarray(materialIds, dtype=np.int32) #(F,) index into materials per polygon, -1 when unassigned
+        self.materials = [(str(name), tuple(float(value) for value in color), str(colorTexture), str(normalTexture)) for name, color, colorTexture, normalTexture in materials] #(name, color, colorTexture, normalTexture) per material
+        self.embeddedImages = dict(embeddedImages or {}) #{texture path: encoded image file} of textures stored inside the mesh file
+        self.shadingEngines = list(shadingEngines or []) #Maya shading engine of every material, only read from Maya
+        self.shadingHistories = [] #(description, files) of the shading network behind every shading engine, read by ReadShadingHistories
+        if triangleFaceVertices is None:
+            triangleFaceVertices = FanTriangulate(self.faceVertexCounts)
+        self.triangleFaceVertices = np.asarray(triangleFaceVertices, dtype=np.int32).reshape(-1, 3) #(T, 3) face-vertex of every triangle corner
+
+        if normals is None or tangents is None:
+            frames = TangentFrames(self.positions, self.Triangles(), self.TriangleUVs())
+        if normals is None: #Flat normals and tangents from the triangle each face-vertex belongs to
+            normals = np.zeros((len(self.faceVertexIds), 3))
+            normals[self.triangleFaceVertices] = frames[:, None, 2]
+        if tangents is None:
+            tangents = np.zeros((len(self.faceVertexIds), 3))
+            tangents[self.triangleFaceVertices] = frames[:, None, 0]
+        self.materialTextures = None #Decoded by the first LoadMaterialTextures
+        self.normals = np.asarray(normals, dtype=np.float32).reshape(-1, 3) #(FV, 3) normal of every face-vertex
+        self.tangents = np.asarray(tangents, dtype=np.float32).reshape(-1, 3) #(FV, 3) tangent of every face-vertex
+
+    def Triangles(self): #(T, 3) vertex ids
+        return self.faceVertexIds[self.triangleFaceVertices]
+
+    def TriangleUVs(self): #(T, 3, 2) uv of every triangle corner, unassigned corners get uv (0, 0)
+        uvTable = np.vstack((self.uvs, np.zeros((1, 2), dtype=np.float32)))
+        return uvTable[self.faceVertexUVIds[self.triangleFaceVertices]]
+
+    def FaceIds(self): #(FV,) polygon of every face-vertex
+        return np.repeat(np.arange(len(self.faceVertexCounts), dtype=np.int32), self.faceVertexCounts)
+
+    def TriangleMaterialIds(self):
+        return self.materialIds[self.FaceIds()[self.triangleFaceVertices[:, 0]]]
+
+    def WithUVs(self, uvs, faceVertexUVIds): #Copy of this snapshot with a different uv layout, as a duplicate with new uvs would be
+        return MeshSnapshot(self.positions, self.faceVertexCounts, self.faceVertexIds, uvs, faceVertexUVIds, self.materialIds, self.materials,
+                            normals=self.normals, triangleFaceVertices=self.triangleFaceVertices, embeddedImages=self.embeddedImages)
+
+    def WithMaterial(self, name, colorTexture, normalTexture): #Copy of this snapshot with every face using one textured material, as a baked mesh has
+        return MeshSnapshot(self.positions, self.faceVertexCounts, self.faceVertexIds, self.uvs, self.faceVertexUVIds, np.zeros(len(self.faceVertexCounts)),
+                            [(name, (1.0, 1.0, 1.0), colorTexture, normalTexture)], normals=self.normals, tangents=self.tangents, triangleFaceVertices=self.triangleFaceVertices)
+
+    def SurfaceArea(self):
+        corners = self.positions[self.Triangles()]
+        return 0.5 * np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1).sum()
+
+    def LoadMaterialTextures(self): #Decodes the textures of every material into MaterialTextures for the transfer, once per snapshot
+        if self.materialTextures is not None:
+            return self.materialTextures
+        images = {} #Materials often share texture files, decode each one once
+        def LoadImage(path):
+            if path and path not in images:
+                images[path] = ReadImage(io.BytesIO(self.embeddedImages[path]) if path in self.embeddedImages else path)
+            return images.get(path)
+        self.materialTextures = [MaterialTextures(name, color, LoadImage(colorTexture), LoadImage(normalTexture)) for name, color, colorTexture, normalTexture in self.materials]
+        return self.materialTextures
+
+    def ReadShadingHistories(self): #Reads the shading networks behind the materials once, they cost a Maya call per attribute of every node so only cache keys read them
+        if self.shadingEngines and not self.shadingHistories:
+            self.shadingHistories = [ReadShadingHistory(shadingEngine) for shadingEngine in self.shadingEngines]
+        return self.shadingHistories
+
+    def Hash(self, hasher): #Feeds the geometry, uvs, materials, their shading networks once read and texture file contents into hasher
+        for array in (self.positions, self.faceVertexCounts, self.faceVertexIds, self.uvs, self.faceVertexUVIds, self.triangleFaceVertices, self.materialIds):
+            hasher.update(np.ascontiguousarray(array).tobytes())
+        hasher.update(repr(self.materials).encode())
+        for name, color, colorTexture, normalTexture in self.materials: #Textures count with their contents, not just their paths
+            for texturePath in (colorTexture, normalTexture):
+                if texturePath in self.embeddedImages:
+                    hasher.update(self.embeddedImages[texturePath])
+                elif os.path.isfile(texturePath):
+                    HashFile(texturePath, hasher)
+        #Layered textures, color gains, uv repeats and further file nodes only show up in the shading network
+        for description, files in self.shadingHistories:
+            hasher.update(description.encode())
+            for path in files:
+                if os.path.isfile(path):
+                    HashFile(path, hasher)
+
+    def Save(self, path): #Writes a compressed .npz that Load reads back without Maya
+        names, colors, colorTextures, normalTextures = zip(*self.materials) if self.materials else ((), (), (), ())
+        np.savez_compressed(path, positions=self.positions, normals=self.normals, tangents=self.tangents, faceVertexCounts=self.faceVertexCounts,
+                            faceVertexIds=self.faceVertexIds, uvs=self.uvs, faceVertexUVIds=self.faceVertexUVIds, triangleFaceVertices=self.triangleFaceVertices,
+                            materialIds=self.materialIds, materialNames=np.array(names, dtype=str), materialColors=np.array(colors, dtype=np.float32).reshape(-1, 3),
+                            materialColorTextures=np.array(colorTextures, dtype=str), materialNormalTextures=np.array(normalTextures, dtype=str),
+                            embeddedImageNames=np.array(list(self.embeddedImages), dtype=str),
+                            **{f"embeddedImage{index}": np.frombuffer(data, dtype=np.uint8) for index, data in enumerate(self.embeddedImages.values())})
+
+    def SaveObj(self, path): #Writes a Wavefront OBJ and an .mtl library of its materials next to it, texture paths are written as they are
+        libraryPath = os.path.splitext(path)[0] + ".mtl"
+        with open(libraryPath, "w") as file:
+            for name, color, colorTexture, normalTexture in self.materials:
+                file.write(f"newmtl {name}\nKd {color[0]:.6g} {color[1]:.6g} {color[2]:.6g}\n")
+                if colorTexture:
+                    file.write(f"map_Kd {colorTexture}\n")
+                if normalTexture:
+                    file.write(f"norm {normalTexture}\n")
+
+        #Every face-vertex keeps its own normal, faces are written grouped by material so each usemtl appears once
+        corners = [f"{vertexId + 1}/{uvId + 1}/{faceVertex + 1}" if uvId >= 0 else f"{vertexId + 1}//{faceVertex + 1}"
+                   for faceVertex, (vertexId, uvId) in enumerate(zip(self.faceVertexIds.tolist(), self.faceVertexUVIds.tolist()))]
+        faceCounts = self.faceVertexCounts.tolist()
+        faceStarts = (np.cumsum(self.faceVertexCounts) - self.faceVertexCounts).tolist()
+        with open(path, "w") as file:
+            file.write(f"mtllib {os.path.basename(libraryPath)}\n")
+            np.savetxt(file, self.positions, fmt="v %.9g %.9g %.9g")
+            np.savetxt(file, self.uvs, fmt="vt %.9g %.9g")
+            np.savetxt(file, self.normals, fmt="vn %.9g %.9g %.9g")
+            currentMaterial = -1
+            for face in np.argsort(self.materialIds, kind="stable").tolist():
+                materialId = int(self.materialIds[face])
+                if materialId != currentMaterial and 0 <= materialId < len(self.materials):
+                    file.write(f"usemtl {self.materials[materialId][0]}\n")
+                    currentMaterial = materialId
+                file.write("f " + " ".join(corners[faceStarts[face]:faceStarts[face] + faceCounts[face]]) + "\n")
+
+    @classmethod
+    def Load(cls, path):
+        with np.load(path) as data:
+            materials = list(zip(data["materialNames"], data["materialColors"], data["materialColorTextures"], data["materialNormalTextures"]))
+            embeddedImageNames = data["embeddedImageNames"] if "embeddedImageNames" in data else [] #Older snapshots have none
+            return cls(data["positions"], data["faceVertexCounts"], data["faceVertexIds"], data["uvs"], data["faceVertexUVIds"], data["materialIds"], materials,
+                       normals=data["normals"], tangents=data["tangents"], triangleFaceVertices=data["triangleFaceVertices"],
+                       embeddedImages={str(name): data[f"embeddedImage{index}"].tobytes() for index, name in enumerate(embeddedImageNames)})
+
+    @classmethod
+    def Combine(cls, snapshots): #One snapshot of several meshes, their faces and face-vertices stay in order mesh after mesh
+        if len(snapshots) == 1:
+            return snapshots[0]
+        materials = []
+        shadingEngines = []
+        materialIndices = {} #Identical materials of different meshes are merged so their textures decode once
+        materialIds = []
+        for snapshot in snapshots:
+            remap = []
+            for materialIndex, material in enumerate(snapshot.materials):
+                if material not in materialIndices:
+                    materialIndices[material] = len(materials)
+                    materials.append(material)
+                    shadingEngines += snapshot.shadingEngines[materialIndex:materialIndex + 1]
+                remap.append(materialIndices[material])
+            remap = np.array(remap + [-1], dtype=np.int32)
+            valid = (snapshot.materialIds >= 0) & (snapshot.materialIds < len(snapshot.materials))
+            materialIds.append(np.where(valid, remap[np.where(valid, snapshot.materialIds, -1)], -1))
+
+        vertexOffsets = np.cumsum([0] + [len(snapshot.positions) for snapshot in snapshots])
+        uvOffsets = np.cumsum([0] + [len(snapshot.uvs) for snapshot in snapshots])
+        faceVertexOffsets = np.cumsum([0] + [len(snapshot.faceVertexIds) for snapshot in snapshots])
+        return cls(np.concatenate([snapshot.positions for snapshot in snapshots]),
+                   np.concatenate([snapshot.faceVertexCounts for snapshot in snapshots]),
+                   np.concatenate([snapshot.faceVertexIds + offset for snapshot, offset in zip(snapshots, vertexOffsets)]),
+                   np.concatenate([snapshot.uvs for snapshot in snapshots]),
+                   np.concatenate([np.where(snapshot.faceVertexUVIds >= 0, snapshot.faceVertexUVIds + offset, -1) for snapshot, offset in zip(snapshots, uvOffsets)]),
+                   np.concatenate(materialIds), materials,
+                   normals=np.concatenate([snapshot.normals for snapshot in snapshots]),
+                   tangents=np.concatenate([snapshot.tangents for snapshot in snapshots]),
+                   triangleFaceVertices=np.concatenate([snapshot.triangleFaceVertices + offset for snapshot, offset in zip(snapshots, faceVertexOffsets)]),
+                   shadingEngines=shadingEngines, embeddedImages={path: data for snapshot in snapshots for path, data in snapshot.embeddedImages.items()})
+
+    @classmethod
+    def FromMaya(cls, meshName, readMaterials=True): #Reads the mesh in a handful of bulk MFnMesh calls, without materials for targets that only need geometry and uvs
+        import maya.api.OpenMaya as om
+
+        meshFn = om.MFnMesh(om.MSelectionList().add(meshName).getDagPath(0).extendToShape())
+        positions = np.array(meshFn.getPoints(om.MSpace.kObject), dtype=np.float64)[:, :3]
+        vertexCounts, vertexIds = meshFn.getVertices()
+        vertexCounts = np.array(vertexCounts, dtype=np.int32)
+        triangleCounts, triangleOffsets = meshFn.getTriangleOffsets() #Offsets into the face-vertex list, so every corner keeps its own uv
+
+        uvSet = meshFn.currentUVSetName()
+        us, vs = meshFn.getUVs(uvSet)
+        uvCounts, uvIds = meshFn.getAssignedUVs(uvSet)
+        faceVertexUVIds = np.full(len(vertexIds), -1, dtype=np.int32)
+        faceVertexUVIds[np.repeat(np.array(uvCounts) > 0, vertexCounts)] = np.array(uvIds, dtype=np.int32)
+
+        normalCounts, normalIds = meshFn.getNormalIds()
+        normalIds = np.array(normalIds, dtype=np.int64)
+        normals = np.array(meshFn.getNormals(om.MSpace.kObject), dtype=np.float32)[normalIds]
+        tangents = None
+        if len(us) > 0: #Tangent ids follow the face-vertex normal ids
+            tangents = np.array(meshFn.getTangents(om.MSpace.kObject, uvSet), dtype=np.float32)[normalIds]
+
+        shadingEngineNames = []
+        faceShaderIds = np.full(len(vertexCounts), -1, dtype=np.int32)
+        if readMaterials:
+            shadingEngines, faceShaderIds = meshFn.getConnectedShaders(0)
+            shadingEngineNames = [om.MFnDependencyNode(shadingEngine).name() for shadingEngine in shadingEngines]
+        return cls(positions, vertexCounts, vertexIds, np.column_stack((us, vs)), faceVertexUVIds, faceShaderIds, [ReadMayaMaterial(name) for name in shadingEngineNames],
+                   normals=normals, tangents=tangents, triangleFaceVertices=np.array(triangleOffsets, dtype=np.int32), shadingEngines=shadingEngineNames)
+
+    @classmethod
+    def FromObj(cls, path): #Reads a Wavefront OBJ and the materials of its .mtl libraries
+        positions, uvs, normalTable = [], [], []
+        faceVertexCounts, faceVertexIds, faceVertexUVIds, faceVertexNormalIds, materialIds = [], [], [], [], []
+        materials = []
+        materialIndices = {}
+        libraries = {}
+        currentMaterial = -1
+
+        with open(path, "r") as file:
+            for line in file:
+                tokens = line.split()
+                if not tokens:
+                    continue
+                if tokens[0] == "v":
+                    positions.append([float(value) for value in tokens[1:4]])
+                elif tokens[0] == "vt":
+                    uvs.append([float(value) for value in tokens[1:3]])
+                elif tokens[0] == "vn":
+                    normalTable.append([float(value) for value in tokens[1:4]])
+                elif tokens[0] == "f":
+                    for corner in tokens[1:]:
+                        ids = corner.split("/") + ["", ""]
+                        faceVertexIds.append(ObjIndex(ids[0], len(positions)))
+                        faceVertexUVIds.append(ObjIndex(ids[1], len(uvs)))
+                        faceVertexNormalIds.append(ObjIndex(ids[2], len(normalTable)))
+                    faceVertexCounts.append(len(tokens) - 1)
+                    materialIds.append(currentMaterial)
+                elif tokens[0] == "mtllib":
+                    libraries.update(ReadMtl(os.path.join(os.path.dirname(path), line.split(None, 1)[1].strip())))
+                elif tokens[0] == "usemtl":
+                    name = line.split(None, 1)[1].strip()
+                    if name not in materialIndices:
+                        materialIndices[name] = len(materials)
+                        materials.append((name,) + libraries.get(name, ((0.5, 0.5, 0.5), "", "")))
+                    currentMaterial = materialIndices[name]
+
+        faceVertexNormalIds = np.array(faceVertexNormalIds, dtype=np.int64)
+        normals = None
+        if len(faceVertexNormalIds) and np.all(faceVertexNormalIds >= 0):
+            normals = np.array(normalTable, dtype=np.float32)[faceVertexNormalIds]
+        return cls(positions, faceVertexCounts, faceVertexIds, uvs, faceVertexUVIds, materialIds, materials, normals=normals)
+
+    @classmethod
+    def FromGltf(cls, path): #Reads every triangle primitive of a .gltf or .glb scene in world space into one snapshot
+        meshes = cls.FromGltfMeshes(path)
+        if not meshes:
+            raise ValueError(f"{path} has no triangle meshes")
+        return cls.Combine([snapshot for name, snapshot in meshes])
+
+    @classmethod
+    def FromGltfMeshes(cls, path): #Returns [(name, snapshot)] in world space for every node of a .gltf or .glb scene with triangle primitives
+        document, binaryChunk = ReadGltfDocument(path)
+        buffers = []
+        for buffer in document.get("buffers", []):
+            uri = buffer.get("uri")
+            if uri is None:
+                buffers.append(binaryChunk)
+            elif uri.startswith("data:"):
+                buffers.append(base64.b64decode(uri.split(",", 1)[1]))
+            else:
+                with open(os.path.join(os.path.dirname(path), uri), "rb") as file:
+                    buffers.append(file.read())
+
+        embeddedImages = {}
+        materials = [ReadGltfMaterial(material, document, buffers, path, embeddedImages) for material in document.get("materials", [])]
+        meshes = []
+        names = set()
+        scene = document.get("scenes", [{}])[document.get("scene", 0)] if document.get("scenes") else {"nodes": range(len(document.get("nodes", [])))}
+        nodesToVisit = [(nodeIndex, np.identity(4)) for nodeIndex in reversed(list(scene.get("nodes", [])))]
+        while nodesToVisit:
+            nodeIndex, parentMatrix = nodesToVisit.pop()
+            node = document["nodes"][nodeIndex]
+            worldMatrix = parentMatrix @ GltfNodeMatrix(node)
+            nodesToVisit.extend((child, worldMatrix) for child in reversed(node.get("children", [])))
+            if "mesh" not in node:
+                continue
+            mesh = document["meshes"][node["mesh"]]
+            #Only triangle lists carry surfaces worth baking
+            parts = [ReadGltfPrimitive(primitive, document, buffers, worldMatrix) for primitive in mesh["primitives"] if primitive.get("mode", 4) == 4]
+            if not parts:
+                continue
+            name = node.get("name") or mesh.get("name") or f"mesh{nodeIndex}"
+            if name in names: #Output names have to stay unique
+                name += f"_{nodeIndex}"
+            names.add(name)
+            meshes.append((name, cls.FromGltfParts(parts, materials, embeddedImages)))
+        return meshes
+
+    @classmethod
+    def FromGltfParts(cls, parts, materials, embeddedImages): #One snapshot of ReadGltfPrimitive parts with only the materials they use
+        usedMaterials = sorted({materialIndex for *_, materialIndex in parts if 0 <= materialIndex < len(materials)})
+        remap = {materialIndex: index for index, materialIndex in enumerate(usedMaterials)}
+        meshMaterials = [materials[materialIndex] for materialIndex in usedMaterials]
+
+        vertexOffset = 0
+        positions, normals, tangents, uvs, faceVertexIds, materialIds = [], [], [], [], [], []
+        for partPositions, partNormals, partTangents, partUVs, partIndices, materialIndex in parts:
+            positions.append(partPositions)
+            uvs.append(partUVs)
+            faceVertexIds.append(partIndices + vertexOffset)
+            normals.append(partNormals[partIndices])
+            tangents.append(partTangents[partIndices] if partTangents is not None else None)
+            materialIds.append(np.full(len(partIndices) // 3, remap.get(materialIndex, -1), dtype=np.int32))
+            vertexOffset += len(partPositions)
+
+        faceVertexIds = np.concatenate(faceVertexIds)
+        hasTangents = all(partTangents is not None for partTangents in tangents)
+        return cls(np.concatenate(positions), np.full(len(faceVertexIds) // 3, 3), faceVertexIds, np.concatenate(uvs), faceVertexIds, np.concatenate(materialIds),
+                   meshMaterials, normals=np.concatenate(normals), tangents=np.concatenate(tangents) if hasTangents else None,
+                   embeddedImages={texture: embeddedImages[texture] for material in meshMaterials for texture in material[2:] if texture in embeddedImages})
+
+    @classmethod
+    def FromFile(cls, path): #Loads a snapshot from any of the supported mesh files
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".npz":
+            return cls.Load(path)
+        if extension == ".obj":
+            return cls.FromObj(path)
+        if extension in (".gltf", ".glb"):
+            return cls.FromGltf(path)
+        raise ValueError(f"Unsupported mesh file {path}")
+
+    @classmethod
+    def MeshesFromFile(cls, path): #Returns [(name, snapshot)] for every mesh of a file, only glTF scenes hold more than one
+        if os.path.splitext(path)[1].lower() in (".gltf", ".glb"):
+            meshes = cls.FromGltfMeshes(path)
+            if not meshes:
+                raise ValueError(f"{path} has no triangle meshes")
+            return meshes
+        return [(os.path.splitext(os.path.basename(path))[0], cls.FromFile(path))]
+
+def FanTriangulate(faceVertexCounts): #(T, 3) face-vertex offsets of a triangle fan over every polygon
+    faceVertexCounts = np.asarray(faceVertexCounts, dtype=np.int64)
+    faceStarts = np.cumsum(faceVertexCounts) - faceVertexCounts
+    triangleCounts = np.maximum(faceVertexCounts - 2, 0)
+    starts = np.repeat(faceStarts, triangleCounts)
+    corners = np.arange(triangleCounts.sum()) - np.repeat(np.cumsum(triangleCounts) - triangleCounts, triangleCounts) + 1
+    return np.column_stack((starts, starts + corners, starts + corners + 1))
+
+def ReadMayaMaterial(shadingEngine): #Returns (name, color, colorTexture, normalTexture) of the shader behind a shading engine
+    import maya.cmds as mc
+
+    shader = (mc.listConnections(f"{shadingEngine}.surfaceShader", s=True, d=False) or [""])[0]
+    color = (0.5, 0.5, 0.5)
+    colorTexture = ""
+    normalTexture = ""
+    if shader == "":
+        return shadingEngine, color, colorTexture, normalTexture
+
+    colorAttr = "baseColor" if mc.attributeQuery("baseColor", node=shader, exists=True) else "color"
+    if mc.attributeQuery(colorAttr, node=shader, exists=True):
+        colorTexture = FindUpstreamFileTexture(f"{shader}.{colorAttr}")
+        color = mc.getAttr(f"{shader}.{colorAttr}")[0]
+
+    if mc.attributeQuery("normalCamera", node=shader, exists=True):
+        normalNode = (mc.listConnections(f"{shader}.normalCamera", s=True, d=False) or [""])[0]
+        #Only tangent space normal maps carry over, height based bump maps are skipped
+        isNormalMap = mc.nodeType(normalNode) == "aiNormalMap" if normalNode else False
+        if normalNode and mc.nodeType(normalNode) == "bump2d":
+            isNormalMap = mc.getAttr(f"{normalNode}.bumpInterp") != 0
+        if isNormalMap:
+            normalTexture = FindUpstreamFileTexture(f"{shader}.normalCamera")
+
+    return shader, color, colorTexture, normalTexture
+
+def FindUpstreamFileTexture(attribute):
+    import maya.cmds as mc
+
+    upstream = mc.listConnections(attribute, s=True, d=False) or []
+    fileNodes = mc.ls(upstream + (mc.listHistory(upstream) or []), type="file") if upstream else []
+    if not fileNodes:
+        return ""
+    return mc.getAttr(f"{fileNodes[0]}.fileTextureName")
+
+def ReadShadingHistory(shadingEngine): #Returns (description, files) of every node upstream of the shader, its type, connections and attribute values
+    import maya.cmds as mc
+
+    shader = mc.listConnections(f"{shadingEngine}.surfaceShader", s=True, d=False) or []
+    description = []
+    files = []
+    for node in sorted(set(mc.listHistory(shader) or [])) if shader else []:
+        connections = mc.listConnections(node, s=True, d=False, plugs=True, connections=True) or []
+        description.append((node, mc.nodeType(node), sorted(zip(connections[::2], connections[1::2]))))
+        for attribute in mc.listAttr(node, settable=True, multi=True) or []:
+            try:
+                value = mc.getAttr(f"{node}.{attribute}")
+            except (RuntimeError, ValueError): #Message and some compound attributes have no value to read
+                continue
+            description.append((attribute, value))
+            #Every file the network reads counts with its contents, whichever node type reads it
+            if isinstance(value, str) and value and mc.attributeQuery(attribute.split(".")[-1].split("[")[0], node=node, usedAsFilename=True):
+                files.append(value)
+    return repr(description), files
+
+def ObjIndex(token, count): #OBJ indices start at 1 and count back from the end when negative, missing ones become -1
+    if token == "":
+        return -1
+    index = int(token)
+    return index - 1 if index > 0 else count + index
+
+def ReadMtl(path): #Returns {material: (color, colorTexture, normalTexture)} from an .mtl file
+    materials = {}
+    if not os.path.exists(path):
+        return materials
+    name = None
+    with open(path, "r") as file:
+        for line in file:
+            tokens = line.split()
+            if not tokens:
+                continue
+            keyword = tokens[0]
+            if keyword == "newmtl":
+                name = line.split(None, 1)[1].strip()
+                materials[name] = [(0.5, 0.5, 0.5), "", ""]
+            elif name is None:
+                continue
+            elif keyword == "Kd":
+                materials[name][0] = tuple(float(value) for value in tokens[1:4])
+            elif keyword == "map_Kd":
+                materials[name][1] = os.path.abspath(os.path.join(os.path.dirname(path), tokens[-1])) #Texture options come before the file name
+            elif keyword in ("norm", "map_Bump", "map_bump", "bump"):
+                materials[name][2] = os.path.abspath(os.path.join(os.path.dirname(path), tokens[-1]))
+    return {name: tuple(values) for name, values in materials.items()}
+
+def ReadGltfDocument(path): #Returns the JSON document and the binary chunk of a .glb, or None for a .gltf
+    with open(path, "rb") as file:
+        data = file.read()
+    if data[:4] != b"glTF":
+        return json.loads(data.decode("utf-8")), None
+
+    document = None
+    binaryChunk = None
+    offset = 12
+    while offset < len(data):
+        chunkLength, chunkType = struct.unpack_from("<I4s", data, offset)
+        chunk = data[offset + 8:offset + 8 + chunkLength]
+        if chunkType == b"JSON":
+            document = json.loads(chunk.decode("utf-8"))
+        elif chunkType == b"BIN\x00":
+            binaryChunk = chunk
+        offset += 8 + chunkLength
+    return document, binaryChunk
+
+def ReadGltfAccessor(document, buffers, accessorIndex):
+    accessor = document["accessors"][accessorIndex]
+    componentType = np.dtype(GLTF_COMPONENT_TYPES[accessor["componentType"]])
+    size = GLTF_TYPE_SIZES[accessor["type"]]
+    count = accessor["count"]
+    rows = np.zeros((count, size), dtype=componentType) #Accessors without a buffer view are all zeros
+    if "bufferView" in accessor:
+        bufferView = document["bufferViews"][accessor["bufferView"]]
+        offset = bufferView.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+        stride = bufferView.get("byteStride", 0) or componentType.itemsize * size
+        rows = np.ndarray((count, size), dtype=componentType, buffer=buffers[bufferView["buffer"]], offset=offset, strides=(stride, componentType.itemsize)).copy()
+
+    if accessor.get("normalized") and componentType.kind in "iu": #Normalized integers map to 0-1 or -1-1
+        rows = np.maximum(rows / np.iinfo(componentType).max, -1.0)
+    return rows[:, 0] if size == 1 else rows
+
+def ReadGltfPrimitive(primitive, document, buffers, worldMatrix): #Returns (positions, normals, tangents, uvs, indices, materialIndex) in world space
+    attributes = primitive["attributes"]
+    positions = ReadGltfAccessor(document, buffers, attributes["POSITION"]).astype(np.float64)
+    indices = ReadGltfAccessor(document, buffers, primitive["indices"]).astype(np.int64) if "indices" in primitive else np.arange(len(positions))
+
+    normalMatrix = np.linalg.inv(worldMatrix[:3, :3]).T
+    positions = positions @ worldMatrix[:3, :3].T + worldMatrix[:3, 3]
+    if "NORMAL" in attributes:
+        normals = ReadGltfAccessor(document, buffers, attributes["NORMAL"]) @ normalMatrix.T
+    else:
+        normals = np.zeros_like(positions)
+    tangents = None
+    if "TANGENT" in attributes:
+        tangents = ReadGltfAccessor(document, buffers, attributes["TANGENT"])[:, :3] @ worldMatrix[:3, :3].T
+    if "TEXCOORD_0" in attributes:
+        uvs = ReadGltfAccessor(document, buffers, attributes["TEXCOORD_0"]).astype(np.float64)
+        uvs[:, 1] = 1.0 - uvs[:, 1] #glTF puts v = 0 at the top of the image
+    else:
+        uvs = np.zeros((len(positions), 2))
+
+    if "NORMAL" not in attributes: #Flat normals from the triangles the vertices belong to
+        triangles = indices.reshape(-1, 3)
+        faceNormals = np.cross(positions[triangles[:, 1]] - positions[triangles[:, 0]], positions[triangles[:, 2]] - positions[triangles[:, 0]])
+        np.add.at(normals, triangles.ravel(), np.repeat(faceNormals, 3, axis=0))
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    return positions, normals, tangents, uvs, indices, primitive.get("material", -1)
+
+def GltfNodeMatrix(node): #Local 4x4 matrix of a node from either its matrix or its translation, rotation and scale
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T #glTF matrices are column major
+    x, y, z, w = node.get("rotation", (0.0, 0.0, 0.0, 1.0))
+    rotation = np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                         [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                         [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+    matrix = np.identity(4)
+    matrix[:3, :3] = rotation * np.array(node.get("scale", (1.0, 1.0, 1.0)))
+    matrix[:3, 3] = node.get("translation", (0.0, 0.0, 0.0))
+    return matrix
+
+def ReadGltfMaterial(material, document, buffers, path, embeddedImages): #Returns (name, color, colorTexture, normalTexture) of a glTF material
+    def TexturePath(textureInfo): #Embedded images go into embeddedImages under a path into the glTF file
+        if textureInfo is None:
+            return ""
+        texture = document["textures"][textureInfo["index"]]
+        if "source" not in texture:
+            raise ValueError(f"{path} has a texture without a source image, texture extensions are not supported")
+        image = document["images"][texture["source"]]
+        if "uri" in image and not image["uri"].startswith("data:"):
+            return os.path.abspath(os.path.join(os.path.dirname(path), image["uri"]))
+
+        imagePath = f"{os.path.abspath(path)}#images/{texture['source']}"
+        if "uri" in image:
+            embeddedImages[imagePath] = base64.b64decode(image["uri"].split(",", 1)[1])
+        else: #Images in .glb files are stored in a buffer view
+            bufferView = document["bufferViews"][image["bufferView"]]
+            offset = bufferView.get("byteOffset", 0)
+            embeddedImages[imagePath] = bytes(buffers[bufferView["buffer"]][offset:offset + bufferView["byteLength"]])
+        return imagePath
+
+    pbr = material.get("pbrMetallicRoughness", {})
+    return (material.get("name", ""), tuple(pbr.get("baseColorFactor", (1.0, 1.0, 1.0, 1.0))[:3]),
+            TexturePath(pbr.get("baseColorTexture")), TexturePath(material.get("normalTexture")))
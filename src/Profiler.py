@@ -0,0 +1,80 @@
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+try: #Peak resident memory comes from getrusage where it exists
+    import resource
+except ImportError: #Windows
+    resource = None
+
+#platform forks a uname process the first time, done at import so the fork never inflates the children's peak memory
+HOST = {"platform": platform.platform(), "python": sys.version.split()[0], "cpus": os.cpu_count()}
+
+class Profiler: #Records wall time, CPU time and memory of named stages of a conversion
+    def __init__(self, trackAllocations=False):
+        self.stages = []
+        self.trackAllocations = trackAllocations #tracemalloc gives every stage its own peak, numpy arrays included, ru_maxrss only knows the process peak
+        self.startedTracing = False #tracemalloc slows every allocation down, so Stop turns it off again when this profiler turned it on
+        self.startTime = time.time()
+
+    @contextlib.contextmanager
+    def Stage(self, name):
+        if self.trackAllocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.startedTracing = True
+            tracemalloc.reset_peak()
+        wallStart = time.perf_counter()
+        cpuStart = time.process_time()
+        try:
+            yield
+        finally:
+            #Pool workers of a stage only show up in the children's peak once they have exited
+            record = {"name": name, "wallSeconds": time.perf_counter() - wallStart, "cpuSeconds": time.process_time() - cpuStart,
+                      "maxRssBytes": GetMaxRss(), "childMaxRssBytes": GetMaxRss(children=True)}
+            if self.trackAllocations:
+                record["peakAllocatedBytes"] = tracemalloc.get_traced_memory()[1]
+            self.stages.append(record)
+
+    def Stop(self): #Call at the end of a run that tracked allocations
+        if self.startedTracing:
+            tracemalloc.stop()
+            self.startedTracing = False
+
+    def Totals(self): #{stage name: total wall seconds}, stages that ran more than once are summed
+        totals = {}
+        for stage in self.stages:
+            totals[stage["name"]] = totals.get(stage["name"], 0.0) + stage["wallSeconds"]
+        return totals
+
+    def Report(self, **details): #JSON-ready report of every stage, with details describing the run
+        return {
+            "details": details,
+            "started": self.startTime,
+            "host": HOST,
+            "stages": self.stages,
+            "totals": self.Totals(),
+            "wallSeconds": sum(stage["wallSeconds"] for stage in self.stages),
+            "cpuSeconds": sum(stage["cpuSeconds"] for stage in self.stages),
+            "maxRssBytes": GetMaxRss(),
+            "childMaxRssBytes": GetMaxRss(children=True),
+            "peakAllocatedBytes": max((stage.get("peakAllocatedBytes", 0) for stage in self.stages), default=0),
+        }
+
+    def WriteReport(self, path, **details):
+        with open(path, "w") as file:
+            json.dump(self.Report(**details), file, indent=2)
+
+def ProfileStage(profiler, name): #profiler.Stage(name), or nothing when no profiler is given
+    return profiler.Stage(name) if profiler else contextlib.nullcontext()
+
+def GetMaxRss(children=False):
+    #Peak resident memory in bytes of this process, or of its largest finished child process like a pool worker, None where the platform does not report it
+    if resource is None:
+        return None
+    maxRss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return maxRss if sys.platform == "darwin" else maxRss * 1024 #Linux reports kilobytes, macOS bytes
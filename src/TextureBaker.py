@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from Dilation import DilateMaps
+from ImageIO import QuantizeImage, ReadImage
+from Profiler import ProfileStage
+from TiledBake import BakeCancelled, BakeTiled, BinTrianglesIntoTiles
+from TextureEncoder import OutputSuffixes, WriteOutputs
+from TextureTransfer import TransferTextures
+
+PROGRESS_WINDOW_SIZE = 256 #Texels per side of the windows an untiled bake with progress reports after
+
+def BakeSnapshot(source, target, resolution, destination, filename, tileSize=0, workerCount=None, dilation=0, superSampling=1, profiler=None, progress=None, shouldCancel=None,
+                 outputFormat="png", colorCompression="bc1", normalBitDepth=8):
+    #Bakes the materials of a source MeshSnapshot into the uv layout of a target snapshot with the same triangles
+    #Writes destination/filename_color and destination/filename_normal in outputFormat, padded dilation texels past the uv charts
+    #superSampling is the most samples per axis spent on the border and high contrast texels
+    #normalBitDepth of 16 keeps 16-bit normals in PNGs, colorCompression picks bc1 or bc3 color for dds and ktx2
+    #Stages are timed on profiler when one is given, progress and shouldCancel work as in BakeTiled
+    with ProfileStage(profiler, "loadTextures"):
+        inputs = (source.positions, source.Triangles(), source.TriangleUVs(), target.TriangleUVs(), source.TriangleMaterialIds(), source.LoadMaterialTextures())
+    if tileSize > 0 and resolution > tileSize:
+        BakeSnapshotTiled(inputs, resolution, destination, filename, tileSize, workerCount, dilation, superSampling, profiler, progress, shouldCancel, outputFormat, colorCompression, normalBitDepth)
+        return
+
+    if progress: #Baked window by window in this process, so progress keeps moving without the scratch files of a tiled bake
+        with ProfileStage(profiler, "sample"):
+            colorMap, normalMap = TransferWindows(inputs, resolution, superSampling, progress, shouldCancel, normalBitDepth)
+    else:
+        if shouldCancel and shouldCancel():
+            raise BakeCancelled()
+        with ProfileStage(profiler, "sample"):
+            colorMap, normalMap = TransferTextures(*inputs, resolution, resolution, superSampling=superSampling)
+            colorMap, normalMap = QuantizeImage(colorMap), QuantizeImage(normalMap, normalBitDepth) #Dilated as integers like the tiled and windowed bakes, so every path writes the same texels
+    with ProfileStage(profiler, "dilate"):
+        DilateMaps(colorMap, normalMap, dilation)
+    with ProfileStage(profiler, "write"):
+        WriteOutputs(destination, filename, colorMap, normalMap, outputFormat, colorCompression)
+
+def TransferWindows(inputs, resolution, superSampling, progress, shouldCancel=None, normalBitDepth=8):
+    #Bakes the map a PROGRESS_WINDOW_SIZE window at a time into uint8 color and normalBitDepth normal maps, calling progress(window, colorMap) after each
+    positions, triangles, sourceUVs, targetUVs, materialIds, materials = inputs
+    targetUVs = np.asarray(targetUVs, dtype=np.float64)
+    colorMap = np.zeros((resolution, resolution, 4), dtype=np.uint8)
+    normalMap = np.empty((resolution, resolution, 3), dtype=np.uint8 if normalBitDepth == 8 else np.uint16)
+    normalMap[:] = QuantizeImage(np.array([0.5, 0.5, 1.0]), normalBitDepth) #Windows without any triangles are never baked and keep a flat normal
+    for window, triangleIds in BinTrianglesIntoTiles(targetUVs, resolution, PROGRESS_WINDOW_SIZE):
+        if shouldCancel and shouldCancel():
+            raise BakeCancelled()
+        colorTile, normalTile = TransferTextures(positions, triangles[triangleIds], sourceUVs[triangleIds], targetUVs[triangleIds], materialIds[triangleIds], materials,
+                                                 resolution, resolution, window, superSampling)
+        x0, y0, x1, y1 = window
+        colorMap[y0:y1, x0:x1] = QuantizeImage(colorTile)
+        normalMap[y0:y1, x0:x1] = QuantizeImage(normalTile, normalBitDepth)
+        progress(window, colorMap)
+    return colorMap, normalMap
+
+def BakeSnapshotTiled(inputs, resolution, destination, filename, tileSize, workerCount, dilation=0, superSampling=1, profiler=None, progress=None, shouldCancel=None,
+                      outputFormat="png", colorCompression="bc1", normalBitDepth=8):
+    #Bakes tiles across worker processes into memory-mapped buffers and streams the outputs from them a strip of rows at a time
+    scratchDirectory = tempfile.mkdtemp(prefix=f"{filename}_bake_", dir=destination)
+    try:
+        with ProfileStage(profiler, "sample"):
+            colorBuffer, normalBuffer = BakeTiled(*inputs, resolution, scratchDirectory, tileSize, workerCount, progress, superSampling, shouldCancel, normalBitDepth)
+        with ProfileStage(profiler, "dilate"):
+            DilateMaps(colorBuffer, normalBuffer, dilation) #Runs in strips so the full map is never loaded at once
+        with ProfileStage(profiler, "write"):
+            WriteOutputs(destination, filename, colorBuffer, normalBuffer, outputFormat, colorCompression)
+        del colorBuffer, normalBuffer #Memmaps have to be closed before the scratch files can be removed
+    finally:
+        shutil.rmtree(scratchDirectory, ignore_errors=True)
+
+def ConvertSampledOutputs(destination, filename, dilation, outputFormat="png", colorCompression="bc1"):
+    #Pads PNGs that were written by another baker, like surfaceSampler, and re-encodes them into outputFormat by reading them back
+    if dilation <= 0 and outputFormat == "png":
+        return
+    pngPaths = [os.path.join(destination, filename + suffix) for suffix in OutputSuffixes("png")]
+    colorMap = ReadImage(pngPaths[0])
+    normalMap = np.ascontiguousarray(ReadImage(pngPaths[1])[:, :, :3])
+    #Maps without alpha only tell coverage apart from the black background
+    coverage = colorMap[:, :, 3] if colorMap.shape[2] == 4 else np.any(colorMap > 0, axis=2)
+    DilateMaps(colorMap, normalMap, dilation, coverage) #Pads the decoded pixels in place, they are written back as they are
+    WriteOutputs(destination, filename, colorMap, normalMap, outputFormat, colorCompression)
+    if outputFormat != "png": #The PNGs were only an intermediate step
+        for path in pngPaths:
+            os.remove(path)
@@ -0,0 +1,217 @@
+import maya.api.OpenMaya as om
+import maya.cmds as mc #Import maya commands
+import maya.mel as mel
+import numpy as np
+import os
+from BakeCache import BakeCacheKey
+from ImageIO import CanReadImagesOffMainThread
+from MeshSnapshot import MeshSnapshot
+from Profiler import Profiler
+from TextureBaker import BakeSnapshot, ConvertSampledOutputs
+from TextureEncoder import OutputSuffixes
+from UVAtlas import GenerateAtlas, WeightedFaceScales
+
+ATLAS_WEIGHT_ATTRIBUTE = "atlasWeight" #Optional float attribute on a mesh transform that sets its share of a combined atlas
+EXPORT_FILE_TYPES = {".ma": "mayaAscii", ".mb": "mayaBinary", ".obj": "OBJexport", ".fbx": "FBX export"} #File type ExportTargets writes per extension
+SAMPLER_SETTINGS = '-ignoreTransforms true -superSampling 3 -filterType 0 -filterSize 3 -overscan 1 -searchMethod 0 -useGeometryNormals 1 -ignoreMirroredFaces 0 -flipU 0 -flipV 0 '
+
+class TextureCombiner:
+    def __init__(self, resolution, destination, filename):
+        self.target = ""
+        self.source = ""
+        self.sources = [] #Meshes packed into one shared atlas and baked in one pass, overrides source when set
+        self.targets = [] #Duplicate of every source, target is the first one
+        self.meshWeights = {} #Share of the atlas per source mesh, charts follow surface area when empty
+        self.textureResolution = resolution
+        self.outputDestination = destination
+        self.filename = filename
+        self.tileSize = 0 #Bake the whole map in one pass unless a tile size is set
+        self.workerCount = os.cpu_count()
+        self.cache = None #BakeCache that unchanged assets are served from
+        self.cacheKey = ""
+        self.uvPadding = 4 #Texels between generated uv charts
+        self.superSampling = 3 #Most samples per axis the native transfer spends on border and high contrast texels
+        self.dilation = 0 #Texels the baked maps are padded past the uv charts, MipPadding(level) keeps mips down to level clean
+        self.outputFormat = "png" #png, or dds and ktx2 for block compressed maps with mip chains
+        self.colorCompression = "bc1" #bc1, or bc3 to keep the coverage alpha in dds and ktx2 color maps
+        self.normalBitDepth = 8 #16 keeps the full precision of natively transferred normals in PNGs
+        self.sourceSnapshot = None #MeshSnapshot of every source combined, read once per run
+        self.profiler = Profiler() #Times every stage of the run, allocations are only tracked for runs that write a report
+        self.reportPath = "" #JSON profile report written after every run when set
+
+    def Run(self, shouldCreateUVs=False, shouldUseNativeTransfer=False): #Runs the whole conversion for the source meshes, returns True on a cache hit
+        if len(self.GetSources()) > 1 and not shouldUseNativeTransfer:
+            raise ValueError("Combining several meshes into one atlas needs the native transfer")
+        self.profiler.trackAllocations = bool(self.reportPath)
+        try:
+            cacheHit = self.LookupCache(shouldCreateUVs, shouldUseNativeTransfer)
+            self.PrepareTarget(shouldCreateUVs) #The layout is deterministic, so a hit still gets the mesh its cached textures were baked for
+            if not cacheHit:
+                if (shouldUseNativeTransfer):
+                    self.RunTextureTransfer()
+                else:
+                    with self.profiler.Stage("sample"): #surfaceSampler writes its files as part of sampling
+                        self.RunSurfaceSampler()
+                    with self.profiler.Stage("dilate"): #Also re-encodes the sampled PNGs into the output format
+                        ConvertSampledOutputs(self.outputDestination, self.filename, self.dilation, self.outputFormat, self.colorCompression)
+                self.StoreCache()
+            self.WriteReport(shouldCreateUVs, shouldUseNativeTransfer, cacheHit)
+        finally: #Never leaves tracemalloc running in the Maya session
+            self.profiler.Stop()
+        return cacheHit
+
+    def GetSources(self):
+        return self.sources if self.sources else [self.source]
+
+    def ReadAtlasWeights(self): #When any source has an atlasWeight attribute every source is sized by weight, 1 when it has none
+        weights = {source: mc.getAttr(f"{source}.{ATLAS_WEIGHT_ATTRIBUTE}") for source in self.GetSources() if mc.attributeQuery(ATLAS_WEIGHT_ATTRIBUTE, node=source, exists=True)}
+        self.meshWeights = {source: float(weights.get(source, 1.0)) for source in self.GetSources()} if weights else {}
+
+    def LookupCache(self, shouldCreateUVs, shouldUseNativeTransfer): #Copies cached outputs when nothing changed, returns True on a hit
+        if not self.cache:
+            return False
+        self.cacheKey = self.ComputeCacheKey(shouldCreateUVs, shouldUseNativeTransfer)
+        with self.profiler.Stage("cacheLookup"):
+            return self.cache.Lookup(self.cacheKey, self.outputDestination, self.filename)
+
+    def StoreCache(self): #Stores the outputs under the key of the last LookupCache
+        if self.cache:
+            with self.profiler.Stage("cacheStore"):
+                self.cache.Store(self.cacheKey, self.outputDestination, self.filename, OutputSuffixes(self.outputFormat))
+
+    def PrepareTarget(self, shouldCreateUVs): #Duplicates and cleans up the source and lays out new uvs when asked
+        self.ReadySelectionForSampling()
+        if self.ShouldLayOutUVs(shouldCreateUVs):
+            self.CreateNewUVs()
+
+    def ShouldLayOutUVs(self, shouldCreateUVs):
+        return shouldCreateUVs or len(self.GetSources()) > 1 #The uvs of separate meshes overlap until they share an atlas
+
+    def WriteReport(self, shouldCreateUVs, shouldUseNativeTransfer, cacheHit):
+        if self.reportPath:
+            self.profiler.WriteReport(self.reportPath, sources=self.GetSources(), resolution=int(self.textureResolution), createUVs=shouldCreateUVs, nativeTransfer=shouldUseNativeTransfer,
+                                      tileSize=self.tileSize, workerCount=self.workerCount, superSampling=self.superSampling, dilation=self.dilation,
+                                      outputFormat=self.outputFormat, colorCompression=self.colorCompression, normalBitDepth=self.normalBitDepth, cacheHit=cacheHit)
+
+    def ComputeCacheKey(self, shouldCreateUVs, shouldUseNativeTransfer):
+        #Hashes the source topology, uvs and points, the materials and texture file contents and every bake setting
+        settings = [int(self.textureResolution), shouldCreateUVs, self.uvPadding, shouldUseNativeTransfer, self.superSampling if shouldUseNativeTransfer else SAMPLER_SETTINGS, self.dilation,
+                    [self.meshWeights.get(source, 1.0) for source in self.GetSources()] if self.meshWeights else "area",
+                    self.outputFormat, self.colorCompression, self.normalBitDepth if shouldUseNativeTransfer else 8]
+        source = self.GetSourceSnapshot()
+        with self.profiler.Stage("shadingHistory"):
+            source.ReadShadingHistories() #Only cache keys need the whole shading network
+        return BakeCacheKey(source, settings)
+
+    def GetSourceSnapshot(self):
+        if self.sourceSnapshot is None:
+            with self.profiler.Stage("snapshot"):
+                self.sourceSnapshot = MeshSnapshot.Combine([MeshSnapshot.FromMaya(source) for source in self.GetSources()])
+        return self.sourceSnapshot
+
+    def CreateNewUVs(self):
+        targets = self.ReadTargetSnapshots()
+        with self.profiler.Stage("generateUVs"):
+            target, layouts = self.LayOutUVs(targets)
+        self.ApplyUVLayouts(layouts)
+
+    def ReadTargetSnapshots(self): #The atlas and the bake only need the geometry and uvs of the duplicates
+        with self.profiler.Stage("snapshot"):
+            return [MeshSnapshot.FromMaya(target, readMaterials=False) for target in self.targets]
+
+    def LayOutUVs(self, targets):
+        #Segments planar charts and packs them with padding measured in texels of the output resolution
+        #Several targets share one atlas, their charts never merge because the meshes share no edges
+        #Never touches Maya, returns the combined target snapshot with the new uvs and the (target, uvs, uvIds, faceVertexCounts) ApplyUVLayouts writes back
+        combined = MeshSnapshot.Combine(targets)
+        faceScales = None
+        if self.meshWeights:
+            weights = [self.meshWeights.get(source, 1.0) for source in self.GetSources()]
+            faceScales = WeightedFaceScales([len(target.faceVertexCounts) for target in targets], [target.SurfaceArea() for target in targets], weights)
+        uvs, uvIds = GenerateAtlas(combined.positions, combined.faceVertexCounts, combined.faceVertexIds, int(self.textureResolution), self.uvPadding, faceScales,
+                                   combined.triangleFaceVertices)
+
+        layouts = []
+        faceVertexStart = 0
+        for targetName, target in zip(self.targets, targets):
+            targetUVIds = uvIds[faceVertexStart:faceVertexStart + len(target.faceVertexIds)]
+            faceVertexStart += len(target.faceVertexIds)
+            usedUVIds, localUVIds = np.unique(targetUVIds, return_inverse=True) #Every mesh only gets the uvs of its own charts
+            layouts.append((targetName, uvs[usedUVIds], localUVIds, target.faceVertexCounts))
+        return combined.WithUVs(uvs, uvIds), layouts
+
+    def ApplyUVLayouts(self, layouts): #Writes every layout back in one go, has to run on Maya's main thread
+        for targetName, uvs, uvIds, faceVertexCounts in layouts:
+            meshFn = om.MFnMesh(om.MSelectionList().add(targetName).getDagPath(0).extendToShape())
+            uvSet = meshFn.currentUVSetName()
+            meshFn.clearUVs(uvSet)
+            meshFn.setUVs(uvs[:, 0].tolist(), uvs[:, 1].tolist(), uvSet)
+            meshFn.assignUVs(faceVertexCounts.tolist(), uvIds.tolist(), uvSet)
+
+    def ReadySelectionForSampling(self):
+        self.targets = []
+        for source in self.GetSources():
+            #Get selected mesh and duplicate
+            with self.profiler.Stage("duplicate"):
+                target = mc.duplicate(source, n=(source + "_dup"))[0]
+            self.targets.append(target)
+            #self.MakeOutputMaterial(target)
+
+            #Delete history (c)hannel (h)istory
+            with self.profiler.Stage("deleteHistory"):
+                mc.delete(target, ch=True)
+            #Freeze transform
+            with self.profiler.Stage("freezeTransform"):
+                mc.makeIdentity(target)
+        self.target = self.targets[0]
+
+    def ExportTargets(self, path): #Exports the duplicates with the uvs the textures were baked for, in the file type of path's extension
+        mc.select(self.targets, replace=True)
+        mc.file(path, force=True, exportSelected=True, preserveReferences=False, type=EXPORT_FILE_TYPES[os.path.splitext(path)[1].lower()])
+
+    def MakeOutputMaterial(self, object):
+        outputMat = mc.shadingNode('aiStandardSurface', asShader=True, name="M_Output")
+        outputMatSG = mc.sets(name="%s" % outputMat, empty=True, renderable=True, noSurfaceShader=True)
+        mc.connectAttr("%s.outColor" % outputMat, "%s.surfaceShader" % outputMatSG, f=True)
+        mc.sets(object, forceElement=outputMatSG)
+
+    def RunSurfaceSampler(self):
+        mc.select(cl=True)
+        mc.select(self.source)
+        mc.select(self.target, add=True)
+        print(f"{self.source} {self.target}")
+        print(f"{self.outputDestination}/{self.filename}")
+
+        commandString = f'surfaceSampler -target {self.target} -uvSet UVSet0 -searchOffset 0 -maxSearchDistance 0 -searchCage "" '
+        commandString += f'-source {self.source} -mapOutput normal -mapWidth {self.textureResolution} -mapHeight {self.textureResolution} -max 1 -mapSpace tangent -mapMaterials 1 -shadows 1 '
+        commandString += f'-filename "{self.outputDestination}/{self.filename}_normal" -fileFormat "png" -mapOutput diffuseRGB '
+        commandString += f'-mapWidth {self.textureResolution} -mapHeight {self.textureResolution} -max 1 -mapSpace tangent -mapMaterials 1 -shadows 1 -filename "{self.outputDestination}/{self.filename}_color" -fileFormat "png" '
+        commandString += SAMPLER_SETTINGS
+
+        print(commandString)
+        mel.eval(commandString)
+
+    def RunTextureTransfer(self):
+        #Maya-free alternative to surfaceSampler, the target is a duplicate so every face maps straight back onto the source
+        self.BakeTextureTransfer(*self.ReadTextureTransferInputs())
+
+    def ReadTextureTransferInputs(self): #Reads the snapshots and textures, has to run on Maya's main thread
+        source = self.ReadSceneInputs()
+        target = MeshSnapshot.Combine(self.ReadTargetSnapshots())
+        self.LoadTextures(source)
+        return source, target
+
+    def ReadSceneInputs(self): #Reads the source snapshot, and its textures when only Maya can decode them, on Maya's main thread
+        source = self.GetSourceSnapshot()
+        if not CanReadImagesOffMainThread(): #Without Pillow textures are decoded by MImage, which stays on the main thread
+            self.LoadTextures(source)
+        return source
+
+    def LoadTextures(self, source): #Decodes the source textures once, with Pillow this can run on a background thread
+        if source.materialTextures is None:
+            with self.profiler.Stage("loadTextures"):
+                source.LoadMaterialTextures()
+
+    def BakeTextureTransfer(self, source, target, progress=None, shouldCancel=None): #Never touches Maya, so it can run on a background thread
+        BakeSnapshot(source, target, int(self.textureResolution), self.outputDestination, self.filename, self.tileSize, self.workerCount, self.dilation, self.superSampling, self.profiler, progress, shouldCancel,
+                     self.outputFormat, self.colorCompression, self.normalBitDepth)
@@ -1,11 +1,21 @@
 from PySide2 import QtCore
-from PySide2.QtGui import QIntValidator, QRegExpValidator
-from PySide2.QtWidgets import QCheckBox, QFileDialog, QHBoxLayout, QLabel, QLineEdit, QMainWindow, QMessageBox, QPushButton, QSlider, QVBoxLayout, QWidget #import classes from the QtWidgets module
-from PySide2.QtCore import Qt #Import Qt class from QtCore
+from PySide2.QtGui import QImage, QIntValidator, QPixmap, QRegExpValidator
+from PySide2.QtWidgets import QCheckBox, QComboBox, QFileDialog, QHBoxLayout, QLabel, QLineEdit, QMainWindow, QMessageBox, QProgressBar, QPushButton, QSlider, QVBoxLayout, QWidget #import classes from the QtWidgets module
+from PySide2.QtCore import QThread, Qt, Signal #Import Qt class from QtCore
 import maya.OpenMayaUI as OpenMayaUI #Import Maya UI module
 import shiboken2 #Import shoken2
 import maya.cmds as mc #Import maya commands
-import maya.mel as mel
+import os
+import numpy as np
+from BakeCache import BakeCache
+from Dilation import MipPadding
+from MeshSnapshot import MeshSnapshot
+from TextureCombiner import TextureCombiner
+from TextureBaker import PROGRESS_WINDOW_SIZE
+from TextureEncoder import OUTPUT_FORMATS
+from TiledBake import BakeCancelled
+
+PREVIEW_SIZE = 256 #Texels per side of the live preview thumbnail
 
 def GetMayaMainWindow()->QMainWindow: #Defines the GetMayaMainWindow() function that returns QMainWindow
     mainWindow = OpenMayaUI.MQtUtil.mainWindow() #Instantiate a mainWindow() class and assign to mainWindow
@@ -25,51 +35,61 @@ class MayaWindow(QWidget): #Define class MayaWindow
     def GetWidgetUniqueName(self): #Defines GetWidgetUniqueName() function
         return "ejdowi309wrjsfmd" #Returns unique identifier for this widget
 
-class TextureCombiner:
-    def __init__(self, resolution, destination, filename):
-        self.target = ""
-        self.source = ""
-        self.textureResolution = resolution
-        self.outputDestination = destination
-        self.filename = filename
-        
-    def CreateNewUVs(self):
-        mc.polyLayoutUV(self.target, layout=2, percentageSpace=2)
-        mc.polyAutoProjection(f'{self.target}.f[*]', ps=0.5)
-        #Auto Layout UVs with padding
-        mc.polyLayoutUV(self.target, layout=2, percentageSpace=2)
-
-    def ReadySelectionForSampling(self):
-        #Get selected mesh and duplicate
-        self.target = mc.duplicate(self.source, n=(self.source + "_dup"))[0]
-        #self.MakeOutputMaterial(self.target)
-
-        #Delete history (c)hannel (h)istory
-        mc.delete(self.target, ch=True)
-        #Freeze transform
-        mc.makeIdentity(self.target)
-
-    def MakeOutputMaterial(self, object):
-        outputMat = mc.shadingNode('aiStandardSurface', asShader=True, name="M_Output")
-        outputMatSG = mc.sets(name="%s" % outputMat, empty=True, renderable=True, noSurfaceShader=True)
-        mc.connectAttr("%s.outColor" % outputMat, "%s.surfaceShader" % outputMatSG, f=True)
-        mc.sets(object, forceElement=outputMatSG)
-
-    def RunSurfaceSampler(self):
-        mc.select(cl=True)
-        mc.select(self.source)
-        mc.select(self.target, add=True)
-        print(f"{self.source} {self.target}")
-        print(f"{self.outputDestination}/{self.filename}")
-
-        commandString = f'surfaceSampler -target {self.target} -uvSet UVSet0 -searchOffset 0 -maxSearchDistance 0 -searchCage "" '
-        commandString += f'-source {self.source} -mapOutput normal -mapWidth {self.textureResolution} -mapHeight {self.textureResolution} -max 1 -mapSpace tangent -mapMaterials 1 -shadows 1 '
-        commandString += f'-filename "{self.outputDestination}/{self.filename}_normal" -fileFormat "png" -mapOutput diffuseRGB '
-        commandString += f'-mapWidth {self.textureResolution} -mapHeight {self.textureResolution} -max 1 -mapSpace tangent -mapMaterials 1 -shadows 1 -filename "{self.outputDestination}/{self.filename}_color" -fileFormat "png" '
-        commandString += f'-ignoreTransforms true -superSampling 3 -filterType 0 -filterSize 3 -overscan 1 -searchMethod 0 -useGeometryNormals 1 -ignoreMirroredFaces 0 -flipU 0 -flipV 0 '
-
-        print(commandString)
-        mel.eval(commandString)
+class TextureBakeThread(QThread): #Runs the Maya-free part of a native bake, the uv atlas, texture decoding and the bake, so the main thread stays responsive
+    uvsLaidOut = Signal(object) #Layouts for TextureCombiner.ApplyUVLayouts, written back on the main thread
+    tileFinished = Signal(int, int, QImage) #Tiles done, tiles in the map, preview of the map so far
+    bakeFinished = Signal()
+    bakeCancelled = Signal()
+    bakeFailed = Signal(str)
+
+    def __init__(self, textureCombiner, source, targets, shouldLayOutUVs, shouldBake=True):
+        super().__init__()
+        self.textureCombiner = textureCombiner
+        self.source = source
+        self.targets = targets #Snapshots of the duplicates
+        self.shouldLayOutUVs = shouldLayOutUVs
+        self.shouldBake = shouldBake #A cache hit only needs the uvs its textures were baked for
+        self.shouldCancel = False #Set from the main thread, the bake stops before its next tile
+
+        resolution = int(textureCombiner.textureResolution)
+        tileSize = textureCombiner.tileSize if 0 < textureCombiner.tileSize < resolution else PROGRESS_WINDOW_SIZE #Untiled bakes report progress per window
+        self.tileCount = ((resolution + tileSize - 1) // tileSize) ** 2 #Empty tiles are skipped, so this is an upper bound
+        self.tilesDone = 0
+        self.previewStep = max(resolution // PREVIEW_SIZE, 1)
+        previewSize = (resolution + self.previewStep - 1) // self.previewStep
+        self.preview = np.zeros((previewSize, previewSize, 4), dtype=np.uint8)
+
+    def run(self):
+        try:
+            if self.shouldLayOutUVs:
+                with self.textureCombiner.profiler.Stage("generateUVs"):
+                    target, layouts = self.textureCombiner.LayOutUVs(self.targets)
+                self.uvsLaidOut.emit(layouts)
+            else:
+                target = MeshSnapshot.Combine(self.targets)
+            if self.shouldBake:
+                if self.shouldCancel:
+                    raise BakeCancelled()
+                self.textureCombiner.LoadTextures(self.source)
+                self.textureCombiner.BakeTextureTransfer(self.source, target, self.TileFinished, lambda: self.shouldCancel)
+        except BakeCancelled:
+            self.bakeCancelled.emit()
+            return
+        except Exception as e: #Report every failure back to the main thread instead of losing it with the thread
+            self.bakeFailed.emit(f"{e}")
+            return
+        self.bakeFinished.emit()
+
+    def TileFinished(self, window, colorBuffer): #Copies every previewStep-th texel of the finished tile into the preview
+        x0, y0, x1, y1 = window
+        rows = np.arange(y0 + (-y0) % self.previewStep, y1, self.previewStep)
+        columns = np.arange(x0 + (-x0) % self.previewStep, x1, self.previewStep)
+        self.preview[np.ix_(rows // self.previewStep, columns // self.previewStep)] = colorBuffer[np.ix_(rows, columns)]
+        self.tilesDone += 1
+
+        height, width = self.preview.shape[:2]
+        image = QImage(self.preview.tobytes(), width, height, width * 4, QImage.Format_RGBA8888).copy() #Copy so the image owns its pixels
+        self.tileFinished.emit(self.tilesDone, self.tileCount, image)
 
 class TextureCombinerWidget(MayaWindow):
     def __init__(self):
@@ -79,6 +99,17 @@ class TextureCombinerWidget(MayaWindow):
         self.saveLocation = ""
         self.fileName = ""
         self.shouldCreateUVs = False
+        self.shouldUseNativeTransfer = False
+        self.shouldTileBake = False
+        self.shouldUseCache = False
+        self.shouldDilate = False
+        self.shouldCombineSelection = False
+        self.outputFormat = OUTPUT_FORMATS[0]
+        self.shouldUse16BitNormals = False
+        self.shouldKeepColorAlpha = False
+        self.bakeThread = None #Background bake in progress
+        self.textureCombiner = None
+        self.cacheHit = False #Whether the running bake only lays out uvs for cached textures
 
         self.masterLayout = QVBoxLayout()
         self.setLayout(self.masterLayout)
@@ -130,17 +161,115 @@ class TextureCombinerWidget(MayaWindow):
         self.createNewUVCheckbox.toggled.connect(self.CreateNewUVCheckboxClicked)
         self.saveFileLayout.addWidget(self.createNewUVCheckbox)
 
+        #
+        # Native Transfer Checkbox
+        #
+        self.nativeTransferCheckbox = QCheckBox("Use Native Transfer?")
+        self.nativeTransferCheckbox.toggled.connect(self.NativeTransferCheckboxClicked)
+        self.saveFileLayout.addWidget(self.nativeTransferCheckbox)
+
+        #
+        # Tiled Bake Checkbox
+        #
+        self.tiledBakeCheckbox = QCheckBox("Tiled Bake?")
+        self.tiledBakeCheckbox.toggled.connect(self.TiledBakeCheckboxClicked)
+        self.saveFileLayout.addWidget(self.tiledBakeCheckbox)
+
+        #
+        # Bake Cache Checkbox
+        #
+        self.bakeCacheCheckbox = QCheckBox("Use Bake Cache?")
+        self.bakeCacheCheckbox.toggled.connect(self.BakeCacheCheckboxClicked)
+        self.saveFileLayout.addWidget(self.bakeCacheCheckbox)
+
+        #
+        # Dilation Checkbox
+        #
+        self.dilationCheckbox = QCheckBox("Dilate Edges?")
+        self.dilationCheckbox.toggled.connect(self.DilationCheckboxClicked)
+        self.saveFileLayout.addWidget(self.dilationCheckbox)
+
+        #
+        # Combine Selection Checkbox
+        #
+        self.combineSelectionCheckbox = QCheckBox("Combine Selection?")
+        self.combineSelectionCheckbox.toggled.connect(self.CombineSelectionCheckboxClicked)
+        self.saveFileLayout.addWidget(self.combineSelectionCheckbox)
+
+        #
+        # Output Format
+        #
+        outputFormatLayout = QHBoxLayout()
+        outputFormatLayout.addWidget(QLabel("Output Format: "))
+        self.outputFormatComboBox = QComboBox()
+        self.outputFormatComboBox.addItems(OUTPUT_FORMATS)
+        self.outputFormatComboBox.currentTextChanged.connect(self.OutputFormatComboBoxChanged)
+        outputFormatLayout.addWidget(self.outputFormatComboBox)
+
+        self.normalBitDepthCheckbox = QCheckBox("16-bit Normals?") #Only PNGs from the native transfer keep the extra precision
+        self.normalBitDepthCheckbox.toggled.connect(self.NormalBitDepthCheckboxClicked)
+        outputFormatLayout.addWidget(self.normalBitDepthCheckbox)
+
+        self.colorAlphaCheckbox = QCheckBox("Keep Color Alpha (BC3)?") #Compressed color is BC1 without alpha otherwise
+        self.colorAlphaCheckbox.toggled.connect(self.ColorAlphaCheckboxClicked)
+        outputFormatLayout.addWidget(self.colorAlphaCheckbox)
+        self.masterLayout.addLayout(outputFormatLayout)
+
         #
         # Combine Texture Button
         #
-        combineTextureButton = QPushButton("Combine Textures")
-        combineTextureButton.clicked.connect(self.RunTextureCombiner)
-        self.masterLayout.addWidget(combineTextureButton)
+        self.combineTextureButton = QPushButton("Combine Textures")
+        self.combineTextureButton.clicked.connect(self.RunTextureCombiner)
+        self.masterLayout.addWidget(self.combineTextureButton)
+
+        #
+        # Bake Progress
+        #
+        progressLayout = QHBoxLayout()
+        self.progressBar = QProgressBar()
+        progressLayout.addWidget(self.progressBar)
+        self.cancelButton = QPushButton("Cancel")
+        self.cancelButton.setEnabled(False)
+        self.cancelButton.clicked.connect(self.CancelButtonClicked)
+        progressLayout.addWidget(self.cancelButton)
+        self.masterLayout.addLayout(progressLayout)
+
+        #
+        # Preview Thumbnail
+        #
+        self.previewLabel = QLabel()
+        self.previewLabel.setFixedSize(PREVIEW_SIZE, PREVIEW_SIZE)
+        self.previewLabel.setAlignment(Qt.AlignCenter)
+        self.masterLayout.addWidget(self.previewLabel)
 
     def CreateNewUVCheckboxClicked(self):
         self.shouldCreateUVs = not self.shouldCreateUVs
         print(self.shouldCreateUVs)
 
+    def NativeTransferCheckboxClicked(self):
+        self.shouldUseNativeTransfer = not self.shouldUseNativeTransfer
+
+    def TiledBakeCheckboxClicked(self):
+        self.shouldTileBake = not self.shouldTileBake
+
+    def BakeCacheCheckboxClicked(self):
+        self.shouldUseCache = not self.shouldUseCache
+
+    def DilationCheckboxClicked(self):
+        self.shouldDilate = not self.shouldDilate
+
+    def CombineSelectionCheckboxClicked(self):
+        self.shouldCombineSelection = not self.shouldCombineSelection
+
+    def OutputFormatComboBoxChanged(self, newVal):
+        self.outputFormat = newVal
+
+    def NormalBitDepthCheckboxClicked(self):
+        self.shouldUse16BitNormals = not self.shouldUse16BitNormals
+
+    def ColorAlphaCheckboxClicked(self):
+        self.shouldKeepColorAlpha = not self.shouldKeepColorAlpha
+
     def FileNameLineEditChanged(self, newVal):
         self.fileName = newVal
 
@@ -164,14 +293,116 @@ class TextureCombinerWidget(MayaWindow):
         elif self.saveLocation == "":
             QMessageBox().critical(None, "Error", "Please pick a save location!")
             return
+        elif self.shouldCombineSelection and not self.shouldUseNativeTransfer:
+            QMessageBox().critical(None, "Error", "Combining a selection needs the native transfer!")
+            return
+        elif self.shouldTileBake and not self.shouldUseNativeTransfer:
+            QMessageBox().critical(None, "Error", "A tiled bake needs the native transfer!")
+            return
+        elif self.shouldUse16BitNormals and not self.shouldUseNativeTransfer:
+            QMessageBox().critical(None, "Error", "16-bit normals need the native transfer!")
+            return
         
         textureCombiner = TextureCombiner(self.resolution, self.saveLocation, self.fileName)
         textureCombiner.source = selectedMesh
-        
+        if (self.shouldCombineSelection): #Every selected mesh goes into one atlas and one texture pair
+            textureCombiner.sources = [node for node in mc.ls(sl=True, transforms=True) if mc.listRelatives(node, shapes=True, type="mesh")]
+            textureCombiner.ReadAtlasWeights()
+        if (self.shouldTileBake):
+            textureCombiner.tileSize = 1024
+        if (self.shouldUseCache):
+            textureCombiner.cache = BakeCache(os.path.join(mc.internalVar(userAppDir=True), "textureCombinerCache"))
+        if (self.shouldDilate):
+            textureCombiner.dilation = MipPadding(3) #Keeps the charts apart down to the 1/8 resolution mip
+        textureCombiner.outputFormat = self.outputFormat
+        if (self.shouldUse16BitNormals):
+            textureCombiner.normalBitDepth = 16
+        if (self.shouldKeepColorAlpha):
+            textureCombiner.colorCompression = "bc3"
+
+        if not self.shouldUseNativeTransfer: #surfaceSampler is a Maya command and has to block the main thread
+            if textureCombiner.Run(self.shouldCreateUVs, self.shouldUseNativeTransfer):
+                print(f"Reused cached textures for {selectedMesh}")
+            self.PrintBakeStats(textureCombiner)
+            return
+
+        #Only the scene reads and edits run here, the atlas, texture decoding and bake run on a background thread
+        self.cacheHit = textureCombiner.LookupCache(self.shouldCreateUVs, True) #Only the bake is skipped, the duplicate still gets its uvs
         textureCombiner.ReadySelectionForSampling()
-        if (self.shouldCreateUVs):
-            textureCombiner.CreateNewUVs()
-        textureCombiner.RunSurfaceSampler()
+        source = None if self.cacheHit else textureCombiner.ReadSceneInputs()
+        targets = textureCombiner.ReadTargetSnapshots()
+        shouldLayOutUVs = textureCombiner.ShouldLayOutUVs(self.shouldCreateUVs)
+        self.textureCombiner = textureCombiner
+        if self.cacheHit and not shouldLayOutUVs:
+            self.FinishBake()
+            self.textureCombiner = None
+            return
+
+        self.bakeThread = TextureBakeThread(textureCombiner, source, targets, shouldLayOutUVs, not self.cacheHit)
+        self.bakeThread.uvsLaidOut.connect(self.UVsLaidOut)
+        self.bakeThread.tileFinished.connect(self.BakeTileFinished)
+        self.bakeThread.bakeFinished.connect(self.BakeFinished)
+        self.bakeThread.bakeCancelled.connect(self.BakeCancelled)
+        self.bakeThread.bakeFailed.connect(self.BakeFailed)
+        self.progressBar.setRange(0, 0) #Busy until the first tile, the atlas and texture decoding report no progress
+        self.previewLabel.clear()
+        self.combineTextureButton.setEnabled(False)
+        self.cancelButton.setEnabled(True)
+        self.bakeThread.start()
+
+    def CancelButtonClicked(self):
+        if self.bakeThread:
+            self.bakeThread.shouldCancel = True
+            self.cancelButton.setEnabled(False)
+
+    def UVsLaidOut(self, layouts): #Queued from the bake thread, so the uvs are written on the main thread
+        self.textureCombiner.ApplyUVLayouts(layouts)
+
+    def BakeTileFinished(self, tilesDone, tileCount, preview):
+        self.progressBar.setRange(0, tileCount)
+        self.progressBar.setValue(min(tilesDone, tileCount))
+        self.previewLabel.setPixmap(QPixmap.fromImage(preview).scaled(PREVIEW_SIZE, PREVIEW_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+
+    def BakeFinished(self):
+        self.progressBar.setRange(0, 1)
+        self.progressBar.setValue(1)
+        self.FinishBake()
+        self.EndBake()
+
+    def FinishBake(self):
+        if self.cacheHit:
+            print(f"Reused cached textures for {self.textureCombiner.source}")
+        else:
+            self.textureCombiner.StoreCache()
+        self.textureCombiner.WriteReport(self.shouldCreateUVs, True, self.cacheHit)
+        self.PrintBakeStats(self.textureCombiner)
+
+    def BakeCancelled(self):
+        print(f"Cancelled the bake of {self.textureCombiner.source}")
+        self.DeleteBakeTarget()
+        self.EndBake()
+
+    def BakeFailed(self, message):
+        self.DeleteBakeTarget()
+        self.EndBake()
+        QMessageBox().critical(None, "Error", f"Bake failed: {message}")
+
+    def DeleteBakeTarget(self): #Removes the _dup meshes of an unfinished bake, scene edits stay on the main thread
+        for target in self.textureCombiner.targets:
+            if mc.objExists(target):
+                mc.delete(target)
+
+    def EndBake(self):
+        self.bakeThread.wait()
+        self.bakeThread = None
+        self.textureCombiner = None
+        self.combineTextureButton.setEnabled(True)
+        self.cancelButton.setEnabled(False)
+
+    def PrintBakeStats(self, textureCombiner):
+        if textureCombiner.cache:
+            print(textureCombiner.cache.GetStats())
+        print(textureCombiner.profiler.Totals())
 
     def SetResolution(self, newVal):
         self.resolution = newVal
@@ -0,0 +1,212 @@
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+from Dilation import RenormalizeNormals
+from ImageIO import WritePng
+
+OUTPUT_FORMATS = ("png", "dds", "ktx2")
+STRIP_ROWS = 64 #Rows encoded or downsampled at a time, so only a strip of any mip level is ever resident
+
+#Per block format: (bytes per 4x4 block, DXGI format for DDS, VkFormat for KTX2, KTX2 color model, KTX2 (channel, bit offset) samples)
+BLOCK_FORMATS = {
+    "bc1": (8, 72, 132, 128, ((0, 0),)), #BC1_UNORM_SRGB, VK_FORMAT_BC1_RGB_SRGB_BLOCK, KHR_DF_MODEL_BC1A, color
+    "bc3": (16, 78, 138, 130, ((15, 0), (0, 64))), #BC3_UNORM_SRGB, VK_FORMAT_BC3_SRGB_BLOCK, KHR_DF_MODEL_BC3, alpha then color
+    "bc5": (16, 83, 141, 132, ((0, 0), (1, 64))), #BC5_UNORM, VK_FORMAT_BC5_UNORM_BLOCK, KHR_DF_MODEL_BC5, red then green
+}
+BC1_INDICES = np.array([1, 3, 2, 0], dtype=np.uint32) #Palette index of each of the 4 steps from color1 to color0
+BC4_INDICES = np.array([1, 7, 6, 5, 4, 3, 2, 0], dtype=np.uint64) #Palette index of each of the 8 steps from the smaller to the larger endpoint
+
+def OutputSuffixes(outputFormat): #Suffixes of the color and normal files a bake in outputFormat writes
+    return (f"_color.{outputFormat}", f"_normal.{outputFormat}")
+
+def WriteOutputs(destination, filename, colorPixels, normalPixels, outputFormat="png", colorCompression="bc1"):
+    #Writes (H, W, 4) color and (H, W, 3) normal integer pixels, PNGs keep their bit depth
+    #dds and ktx2 hold BC1 or BC3 color and BC5 normals with full mip chains, encoded a strip of rows at a time
+    colorPath, normalPath = (os.path.join(destination, filename + suffix) for suffix in OutputSuffixes(outputFormat))
+    if outputFormat == "png":
+        WritePng(colorPath, colorPixels)
+        WritePng(normalPath, normalPixels)
+        return
+    if outputFormat not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {outputFormat}, expected one of {', '.join(OUTPUT_FORMATS)}")
+
+    scratchDirectory = tempfile.mkdtemp(prefix=f"{filename}_encode_", dir=destination)
+    try:
+        for path, pixels, blockFormat, isNormal in ((colorPath, colorPixels, colorCompression, False), (normalPath, normalPixels, "bc5", True)):
+            levels = EncodeMipChain(pixels, blockFormat, isNormal, scratchDirectory)
+            WriteContainer = WriteDds if outputFormat == "dds" else WriteKtx2
+            WriteContainer(path, levels, pixels.shape[1], pixels.shape[0], blockFormat, isNormal)
+            for levelPath, width, height in levels:
+                os.remove(levelPath)
+    finally:
+        shutil.rmtree(scratchDirectory, ignore_errors=True)
+
+def EncodeMipChain(pixels, blockFormat, isNormal, scratchDirectory):
+    #Encodes pixels and every smaller mip down to 1x1, returns [(blocks file, width, height)] from the largest level down
+    #Each mip is box filtered from the one above it through a memory-mapped scratch image, normals are renormalized
+    levels = []
+    image = pixels
+    level = 0
+    while True:
+        height, width = image.shape[:2]
+        levelPath = os.path.join(scratchDirectory, f"level{level}.blocks")
+        with open(levelPath, "wb") as file:
+            for rowStart in range(0, height, STRIP_ROWS):
+                file.write(EncodeBlocks(image[rowStart:rowStart + STRIP_ROWS], blockFormat).tobytes())
+        levels.append((levelPath, width, height))
+        if width == 1 and height == 1:
+            return levels
+
+        nextImage = np.lib.format.open_memmap(os.path.join(scratchDirectory, f"level{level + 1}.npy"), mode="w+", dtype=image.dtype,
+                                              shape=(max(height // 2, 1), max(width // 2, 1), image.shape[2]))
+        for rowStart in range(0, nextImage.shape[0], STRIP_ROWS):
+            rowEnd = min(rowStart + STRIP_ROWS, nextImage.shape[0])
+            nextImage[rowStart:rowEnd] = DownsampleRows(image, rowStart, rowEnd, nextImage.shape[1], isNormal)
+        nextImage.flush()
+        image = nextImage
+        level += 1
+
+def DownsampleRows(image, rowStart, rowEnd, nextWidth, isNormal): #Box filters the 2x2 texels under rows [rowStart, rowEnd) of the next mip
+    height, width = image.shape[:2]
+    rows = np.arange(rowStart * 2, rowEnd * 2) #A dimension that is already 1 repeats its only texel
+    columns = np.arange(nextWidth * 2)
+    strip = image[np.minimum(rows, height - 1)][:, np.minimum(columns, width - 1)].astype(np.float32)
+    average = (strip[0::2, 0::2] + strip[1::2, 0::2] + strip[0::2, 1::2] + strip[1::2, 1::2]) * 0.25
+    if isNormal:
+        return RenormalizeNormals((average / np.iinfo(image.dtype).max).astype(np.float32)) * np.iinfo(image.dtype).max + 0.5
+    return average + 0.5
+
+def EncodeBlocks(strip, blockFormat): #Encodes a strip of rows into (blocks, bytes per block) uint8, row of blocks by row of blocks
+    if strip.dtype == np.uint16: #Block formats store 8-bit endpoints
+        strip = ((strip.astype(np.uint32) + 128) // 257).astype(np.uint8)
+    height, width, channels = strip.shape
+    paddedHeight = -height % 4
+    paddedWidth = -width % 4
+    if paddedHeight or paddedWidth: #Edge texels fill partial blocks
+        strip = np.pad(strip, ((0, paddedHeight), (0, paddedWidth), (0, 0)), mode="edge")
+        height, width = strip.shape[:2]
+    blocks = strip.reshape(height // 4, 4, width // 4, 4, channels).transpose(0, 2, 1, 3, 4).reshape(-1, 16, channels)
+
+    if blockFormat == "bc1":
+        return EncodeBC1(blocks[:, :, :3])
+    if blockFormat == "bc3":
+        alpha = blocks[:, :, 3] if channels == 4 else np.full(blocks.shape[:2], 255, dtype=np.uint8)
+        return np.concatenate((EncodeBC4(alpha), EncodeBC1(blocks[:, :, :3])), axis=1)
+    if blockFormat == "bc5":
+        return np.concatenate((EncodeBC4(blocks[:, :, 0]), EncodeBC4(blocks[:, :, 1])), axis=1)
+    raise ValueError(f"Unknown block format {blockFormat}")
+
+def EncodeBC1(blocks):
+    #(N, 16, 3) uint8 RGB blocks -> (N, 8) BC1 blocks, endpoints are the texels furthest apart along each block's principal axis
+    colors = blocks.astype(np.float32)
+    centered = colors - colors.mean(axis=1, keepdims=True)
+    covariance = centered.transpose(0, 2, 1) @ centered
+    axis = np.ones((len(blocks), 3, 1), dtype=np.float32)
+    for _ in range(4): #Power iteration converges on the dominant axis quickly for 3x3 matrices
+        axis = covariance @ axis
+        axis /= np.maximum(np.abs(axis).max(axis=1, keepdims=True), 1e-12)
+    projection = (colors @ axis)[:, :, 0]
+    blockIds = np.arange(len(blocks))
+    color0 = ToRgb565(colors[blockIds, projection.argmax(axis=1)])
+    color1 = ToRgb565(colors[blockIds, projection.argmin(axis=1)])
+    swap = color0 < color1 #Four color mode needs color0 > color1
+    color0, color1 = np.where(swap, color1, color0), np.where(swap, color0, color1)
+
+    #Texels snap to the nearest of the four evenly spaced palette colors along the quantized endpoint line
+    endpoint0 = FromRgb565(color0)
+    endpoint1 = FromRgb565(color1)
+    line = endpoint0 - endpoint1
+    lengthSquared = np.maximum((line * line).sum(axis=1), 1e-12)
+    steps = np.clip(((colors - endpoint1[:, None, :]) @ line[:, :, None])[:, :, 0] * (3.0 / lengthSquared[:, None]) + 0.5, 0, 3).astype(np.uint32)
+    indices = BC1_INDICES[steps]
+    indices[color0 == color1] = 0 #Equal endpoints would switch plain BC1 into its three color mode
+
+    packed = np.empty((len(blocks), 2), dtype="<u4")
+    packed[:, 0] = color0 | (color1 << 16)
+    packed[:, 1] = PackIndices(indices, 2)
+    return packed.view(np.uint8)
+
+def EncodeBC4(values):
+    #(N, 16) uint8 single channel blocks -> (N, 8) BC4 blocks in the eight value mode between the block's min and max
+    values = values.astype(np.int32)
+    value0 = values.max(axis=1)
+    value1 = values.min(axis=1)
+    span = np.maximum(value0 - value1, 1)
+    steps = ((values - value1[:, None]) * 7 + span[:, None] // 2) // span[:, None]
+    indices = BC4_INDICES[steps]
+    indices[value0 == value1] = 0
+
+    packed = np.empty((len(values), 8), dtype=np.uint8)
+    packed[:, 0] = value0
+    packed[:, 1] = value1
+    packed[:, 2:] = PackIndices(indices, 3).astype("<u8").view(np.uint8).reshape(-1, 8)[:, :6] #48 bits of 3-bit indices
+    return packed
+
+def PackIndices(indices, bits): #Packs (N, 16) block indices into one integer per block, the first texel in the lowest bits
+    columns = np.ascontiguousarray(indices.T)
+    packed = np.zeros(len(indices), dtype=indices.dtype)
+    for texel in range(16):
+        packed |= columns[texel] << indices.dtype.type(bits * texel)
+    return packed
+
+def ToRgb565(colors):
+    red = (colors[:, 0] * 31 / 255 + 0.5).astype(np.uint32)
+    green = (colors[:, 1] * 63 / 255 + 0.5).astype(np.uint32)
+    blue = (colors[:, 2] * 31 / 255 + 0.5).astype(np.uint32)
+    return (red << 11) | (green << 5) | blue
+
+def FromRgb565(packed): #The 8-bit colors a decoder expands a 5:6:5 endpoint to
+    red = (packed >> 11) & 31
+    green = (packed >> 5) & 63
+    blue = packed & 31
+    return np.stack(((red << 3) | (red >> 2), (green << 2) | (green >> 4), (blue << 3) | (blue >> 2)), axis=1).astype(np.float32)
+
+def WriteDds(path, levels, width, height, blockFormat, isNormal): #DDS with a DX10 header so the color space and BC5 are explicit
+    blockBytes, dxgiFormat = BLOCK_FORMATS[blockFormat][:2]
+    flags = 0x1 | 0x2 | 0x4 | 0x1000 | 0x20000 | 0x80000 #Caps, height, width, pixel format, mip count, linear size
+    caps = 0x1000 | 0x8 | 0x400000 #Texture, complex, mipmap
+    with open(path, "wb") as file:
+        file.write(b"DDS ")
+        file.write(struct.pack("<7I44x", 124, flags, height, width, os.path.getsize(levels[0][0]), 0, len(levels)))
+        file.write(struct.pack("<2I4s5I", 32, 0x4, b"DX10", 0, 0, 0, 0, 0)) #Pixel format, the real one is in the DX10 header
+        file.write(struct.pack("<4I4x", caps, 0, 0, 0))
+        file.write(struct.pack("<5I", dxgiFormat, 3, 0, 1, 0)) #2D texture, no flags, array of 1
+        for levelPath, levelWidth, levelHeight in levels:
+            with open(levelPath, "rb") as level:
+                shutil.copyfileobj(level, file)
+
+def WriteKtx2(path, levels, width, height, blockFormat, isNormal): #KTX2 without supercompression, mips are stored smallest first
+    blockBytes, dxgiFormat, vkFormat, colorModel, samples = BLOCK_FORMATS[blockFormat]
+    transferFunction = 1 if isNormal else 2 #Linear for normals, sRGB for color
+    descriptorSize = 24 + 16 * len(samples)
+    dataFormatDescriptor = struct.pack("<I", 4 + descriptorSize)
+    dataFormatDescriptor += struct.pack("<4I8B", 0, 2 | (descriptorSize << 16), colorModel | (1 << 8) | (transferFunction << 16), 3 | (3 << 8), blockBytes, 0, 0, 0, 0, 0, 0, 0)
+    for channel, bitOffset in samples:
+        dataFormatDescriptor += struct.pack("<4I", bitOffset | (63 << 16) | (channel << 24), 0, 0, 0xFFFFFFFF)
+
+    levelIndexOffset = 12 + 36 + 32
+    descriptorOffset = levelIndexOffset + 24 * len(levels)
+    offset = descriptorOffset + len(dataFormatDescriptor)
+    levelIndex = [None] * len(levels)
+    layout = []
+    for level in reversed(range(len(levels))):
+        offset += -offset % blockBytes #Every level starts on a block boundary
+        levelBytes = os.path.getsize(levels[level][0])
+        levelIndex[level] = struct.pack("<3Q", offset, levelBytes, levelBytes)
+        layout.append((offset, levels[level][0]))
+        offset += levelBytes
+
+    with open(path, "wb") as file:
+        file.write(b"\xabKTX 20\xbb\r\n\x1a\n")
+        file.write(struct.pack("<9I", vkFormat, 1, width, height, 0, 0, 1, len(levels), 0))
+        file.write(struct.pack("<4I2Q", descriptorOffset, len(dataFormatDescriptor), 0, 0, 0, 0))
+        file.write(b"".join(levelIndex))
+        file.write(dataFormatDescriptor)
+        for levelOffset, levelPath in layout:
+            file.write(b"\x00" * (levelOffset - file.tell()))
+            with open(levelPath, "rb") as level:
+                shutil.copyfileobj(level, file)
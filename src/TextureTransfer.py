@@ -0,0 +1,245 @@
+import numpy as np
+
+FLAT_NORMAL = np.array([0.0, 0.0, 1.0], dtype=np.float32) #Tangent space normal pointing straight out of the surface
+
+class MaterialTextures: #Decoded textures of a single source material
+    def __init__(self, name, color=(0.5, 0.5, 0.5), colorMap=None, normalMap=None):
+        self.name = name
+        self.color = np.asarray(color, dtype=np.float32)[:3] #Used when the material has no color texture
+        self.colorMap = colorMap #(height, width, channels) uint8 or uint16 array or None
+        self.normalMap = normalMap #Tangent space normal map as a (height, width, channels) uint8 or uint16 array or None
+
+    def SampleColor(self, uvs):
+        if self.colorMap is None:
+            return np.broadcast_to(self.color, (len(uvs), 3))
+        return SampleBilinear(self.colorMap, uvs)[:, :3]
+
+    def SampleNormal(self, uvs):
+        if self.normalMap is None:
+            return np.broadcast_to(FLAT_NORMAL, (len(uvs), 3))
+        return SampleBilinear(self.normalMap, uvs)[:, :3] * 2.0 - 1.0
+
+def SampleBilinear(image, uvs): #Samples an image at (N, 2) uv coordinates, wrapping outside of the 0-1 range
+    #Integer images come back in the 0-1 range, only the sampled texels are ever converted to float
+    height, width = image.shape[:2]
+    x = uvs[:, 0] * width - 0.5
+    y = (1.0 - uvs[:, 1]) * height - 0.5 #Row 0 is the top of the image, v = 0 is the bottom
+
+    x0 = np.floor(x)
+    y0 = np.floor(y)
+    fx = (x - x0)[:, None].astype(np.float32)
+    fy = (y - y0)[:, None].astype(np.float32)
+    x0 = x0.astype(np.int64) % width
+    y0 = y0.astype(np.int64) % height
+    x1 = (x0 + 1) % width
+    row0 = y0 * width
+    row1 = ((y0 + 1) % height) * width
+
+    texels = image.reshape(height * width, -1) #Flat indexing is much cheaper than 2D fancy indexing
+    top = texels[row0 + x0] * (1.0 - fx) + texels[row0 + x1] * fx
+    bottom = texels[row1 + x0] * (1.0 - fx) + texels[row1 + x1] * fx
+    scale = np.float32(1.0 / np.iinfo(image.dtype).max) if image.dtype.kind in "ui" else np.float32(1.0)
+    return (top * (1.0 - fy) + bottom * fy) * scale
+
+def RasterizeTriangles(uvs, width, height, window=None, chunkSize=1 << 22):
+    #Finds every texel center covered by each (T, 3, 2) uv triangle, optionally limited to a (x0, y0, x1, y1) texel window
+    #Yields (triangleIds, pixelX, pixelY, barycentrics) in chunks of at most chunkSize candidate texels
+    windowX0, windowY0, windowX1, windowY1 = window if window else (0, 0, width, height)
+    pixelX = (uvs[:, :, 0] * width - 0.5).astype(np.float32) #Texel x has its center at pixel coordinate x
+    pixelY = ((1.0 - uvs[:, :, 1]) * height - 0.5).astype(np.float32)
+
+    minX = np.clip(np.ceil(pixelX.min(axis=1)), windowX0, windowX1).astype(np.int64)
+    maxX = np.clip(np.floor(pixelX.max(axis=1)), windowX0 - 1, windowX1 - 1).astype(np.int64)
+    minY = np.clip(np.ceil(pixelY.min(axis=1)), windowY0, windowY1).astype(np.int64)
+    maxY = np.clip(np.floor(pixelY.max(axis=1)), windowY0 - 1, windowY1 - 1).astype(np.int64)
+    boxWidth = np.maximum(maxX - minX + 1, 0)
+    boxHeight = np.maximum(maxY - minY + 1, 0)
+    candidateCounts = boxWidth * boxHeight
+
+    triangleIds = np.nonzero(candidateCounts)[0]
+    chunkStart = 0
+    while chunkStart < len(triangleIds):
+        #Grow the chunk until it holds chunkSize candidates, always taking at least one triangle
+        counts = np.cumsum(candidateCounts[triangleIds[chunkStart:]])
+        chunkEnd = chunkStart + max(int(np.searchsorted(counts, chunkSize, side="right")), 1)
+        chunk = triangleIds[chunkStart:chunkEnd]
+        chunkStart = chunkEnd
+
+        chunkCounts = candidateCounts[chunk]
+        candidateTriangles = np.repeat(chunk, chunkCounts)
+        local = np.arange(len(candidateTriangles)) - np.repeat(np.cumsum(chunkCounts) - chunkCounts, chunkCounts)
+        xs = minX[candidateTriangles] + local % boxWidth[candidateTriangles]
+        ys = minY[candidateTriangles] + local // boxWidth[candidateTriangles]
+
+        barycentrics = Barycentrics(pixelX[candidateTriangles], pixelY[candidateTriangles], xs, ys)
+        inside = np.all(barycentrics >= -1e-6, axis=1)
+        yield candidateTriangles[inside], xs[inside], ys[inside], barycentrics[inside]
+
+def Barycentrics(cornersX, cornersY, xs, ys): #Barycentric coordinates of points (xs, ys) in (N, 3) corner arrays
+    v0x = cornersX[:, 1] - cornersX[:, 0]
+    v0y = cornersY[:, 1] - cornersY[:, 0]
+    v1x = cornersX[:, 2] - cornersX[:, 0]
+    v1y = cornersY[:, 2] - cornersY[:, 0]
+    v2x = xs - cornersX[:, 0]
+    v2y = ys - cornersY[:, 0]
+
+    denominator = v0x * v1y - v1x * v0y
+    denominator = np.where(denominator == 0, np.inf, denominator) #Degenerate triangles end up outside
+    b1 = (v2x * v1y - v1x * v2y) / denominator
+    b2 = (v0x * v2y - v2x * v0y) / denominator
+    b0 = np.where(np.isinf(denominator), -1.0, 1.0 - b1 - b2)
+    return np.stack((b0, b1, b2), axis=1)
+
+def TangentFrames(positions, triangles, uvs): #Per triangle orthonormal (T, 3, 3) tangent, bitangent, normal frames
+    p0 = positions[triangles[:, 0]]
+    edge1 = positions[triangles[:, 1]] - p0
+    edge2 = positions[triangles[:, 2]] - p0
+    deltaUV1 = uvs[:, 1] - uvs[:, 0]
+    deltaUV2 = uvs[:, 2] - uvs[:, 0]
+
+    normal = Normalize(np.cross(edge1, edge2))
+    determinant = deltaUV1[:, 0] * deltaUV2[:, 1] - deltaUV2[:, 0] * deltaUV1[:, 1]
+    tangent = edge1 * deltaUV2[:, 1:2] - edge2 * deltaUV1[:, 1:2]
+    tangent *= np.where(determinant < 0, -1.0, 1.0)[:, None] #Keep the tangent pointing along +u when the uvs are mirrored
+    tangent = tangent - normal * np.sum(tangent * normal, axis=1, keepdims=True)
+
+    #Triangles without usable uvs get any tangent perpendicular to the normal
+    degenerate = np.linalg.norm(tangent, axis=1) < 1e-12
+    if np.any(degenerate):
+        fallbackAxis = np.where(np.abs(normal[degenerate, 0:1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]])
+        tangent[degenerate] = np.cross(normal[degenerate], fallbackAxis)
+    tangent = Normalize(tangent)
+
+    handedness = np.where(determinant < 0, -1.0, 1.0)[:, None]
+    bitangent = np.cross(normal, tangent) * handedness
+    return np.stack((tangent, bitangent, normal), axis=1)
+
+def Normalize(vectors):
+    lengths = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(lengths == 0, 1.0, lengths)
+
+def TransferTextures(positions, triangles, sourceUVs, targetUVs, materialIds, materials, width, height, window=None, superSampling=1, contrastThreshold=0.1):
+    #Bakes the source materials into the target uv layout of the same triangles
+    #positions (V, 3), triangles (T, 3) vertex ids, sourceUVs and targetUVs (T, 3, 2), materialIds (T,) indices into materials
+    #Returns a (height, width, 4) color map with coverage in alpha and a (height, width, 3) tangent space normal map
+    #When a (x0, y0, x1, y1) window is given only that region of the width x height map is baked and returned
+    #With superSampling above 1 texels on chart borders, material borders or high contrast get up to superSampling^2 samples
+    windowX0, windowY0, windowX1, windowY1 = window if window else (0, 0, width, height)
+    positions = np.asarray(positions, dtype=np.float64)
+    triangles = np.asarray(triangles, dtype=np.int64)
+    sourceUVs = np.asarray(sourceUVs, dtype=np.float64)
+    targetUVs = np.asarray(targetUVs, dtype=np.float64)
+    materialIds = np.asarray(materialIds, dtype=np.int64)
+
+    #Refinement looks one texel past the window so tiles decide exactly like a single pass bake would
+    margin = 1 if superSampling > 1 else 0
+    region = (max(windowX0 - margin, 0), max(windowY0 - margin, 0), min(windowX1 + margin, width), min(windowY1 + margin, height))
+    regionX0, regionY0, regionX1, regionY1 = region
+
+    colorMap = np.zeros((regionY1 - regionY0, regionX1 - regionX0, 4), dtype=np.float32)
+    normalMap = np.empty((regionY1 - regionY0, regionX1 - regionX0, 3), dtype=np.float32)
+    normalMap[:] = FLAT_NORMAL * 0.5 + 0.5
+    triangleMap = np.full((regionY1 - regionY0, regionX1 - regionX0), -1, dtype=np.int64) #Triangle at each texel center
+
+    sourceFrames = TangentFrames(positions, triangles, sourceUVs)
+    targetFrames = TangentFrames(positions, triangles, targetUVs)
+    def Shade(triangleIds, barycentrics): #Color and target tangent space normal of samples inside the given triangles
+        uvs = np.sum(barycentrics[:, :, None] * sourceUVs[triangleIds], axis=1)
+        colors, normals = SampleMaterials(uvs, materialIds[triangleIds], materials)
+
+        #Tangent space of the source face -> world -> tangent space of the target face
+        worldNormals = np.sum(normals[:, :, None] * sourceFrames[triangleIds], axis=1)
+        return colors, Normalize(np.sum(targetFrames[triangleIds] * worldNormals[:, None, :], axis=2))
+
+    for triangleIds, xs, ys, barycentrics in RasterizeTriangles(targetUVs, width, height, region):
+        colors, targetNormals = Shade(triangleIds, barycentrics)
+        xs = xs - regionX0
+        ys = ys - regionY0
+        colorMap[ys, xs, :3] = colors
+        colorMap[ys, xs, 3] = 1.0
+        normalMap[ys, xs] = targetNormals * 0.5 + 0.5
+        triangleMap[ys, xs] = triangleIds
+
+    if superSampling > 1:
+        refineY, refineX = np.nonzero(FindRefineTexels(colorMap, normalMap, triangleMap, materialIds, contrastThreshold))
+        inWindow = (refineX + regionX0 >= windowX0) & (refineX + regionX0 < windowX1) & (refineY + regionY0 >= windowY0) & (refineY + regionY0 < windowY1)
+        RefineTexels(colorMap, normalMap, triangleMap, refineY[inWindow], refineX[inWindow], region, targetUVs, width, height, superSampling, Shade)
+
+    crop = (slice(windowY0 - regionY0, windowY1 - regionY0), slice(windowX0 - regionX0, windowX1 - regionX0))
+    return colorMap[crop], normalMap[crop]
+
+def FindRefineTexels(colorMap, normalMap, triangleMap, materialIds, contrastThreshold):
+    #Texels whose one sample is not enough: next to uncovered texels, on material borders or against a neighbour that differs by more than contrastThreshold
+    covered = triangleMap >= 0
+    materialMap = np.where(covered, materialIds[np.maximum(triangleMap, 0)], -1)
+    refine = np.zeros(triangleMap.shape, dtype=bool)
+    for axis in (0, 1): #Each pair of horizontal and vertical neighbours is compared once and marks both texels
+        first = (slice(None, -1), slice(None)) if axis == 0 else (slice(None), slice(None, -1))
+        second = (slice(1, None), slice(None)) if axis == 0 else (slice(None), slice(1, None))
+        contrast = np.maximum(np.abs(colorMap[first][..., :3] - colorMap[second][..., :3]).max(axis=-1),
+                              np.abs(normalMap[first] - normalMap[second]).max(axis=-1))
+        differs = (covered[first] != covered[second]) | (materialMap[first] != materialMap[second])
+        differs |= covered[first] & covered[second] & (contrast > contrastThreshold)
+        refine[first] |= differs
+        refine[second] |= differs
+    return refine
+
+def RefineTexels(colorMap, normalMap, triangleMap, refineY, refineX, region, targetUVs, width, height, superSampling, Shade, chunkSize=1 << 16):
+    #Resolves superSampling x superSampling samples for each texel, averaging the samples that land inside a triangle
+    #Candidate triangles are the ones found at the texel centers of the 3x3 neighbourhood, alpha becomes the covered fraction
+    regionX0, regionY0 = region[:2]
+    pixelX = targetUVs[:, :, 0] * width - 0.5
+    pixelY = (1.0 - targetUVs[:, :, 1]) * height - 0.5
+    offsets = (np.arange(superSampling) + 0.5) / superSampling - 0.5
+    offsetX = np.tile(offsets, superSampling)
+    offsetY = np.repeat(offsets, superSampling)
+    sampleCount = len(offsetX)
+    paddedTriangles = np.pad(triangleMap, 1, constant_values=-1)
+
+    for chunkStart in range(0, len(refineY), chunkSize):
+        texelY = refineY[chunkStart:chunkStart + chunkSize]
+        texelX = refineX[chunkStart:chunkStart + chunkSize]
+        candidates = np.stack([paddedTriangles[texelY + 1 + dy, texelX + 1 + dx] for dy in (-1, 0, 1) for dx in (-1, 0, 1)], axis=1)
+
+        #Every sample takes the first candidate triangle it lands in
+        sampleX = ((texelX + regionX0)[:, None] + offsetX).ravel()
+        sampleY = ((texelY + regionY0)[:, None] + offsetY).ravel()
+        sampleTriangles = np.full(len(sampleX), -1, dtype=np.int64)
+        sampleBarycentrics = np.zeros((len(sampleX), 3))
+        for candidate in candidates.T:
+            candidate = np.repeat(candidate, sampleCount)
+            pending = np.flatnonzero((sampleTriangles < 0) & (candidate >= 0))
+            triangleIds = candidate[pending]
+            barycentrics = Barycentrics(pixelX[triangleIds], pixelY[triangleIds], sampleX[pending], sampleY[pending])
+            inside = np.all(barycentrics >= -1e-6, axis=1)
+            sampleTriangles[pending[inside]] = triangleIds[inside]
+            sampleBarycentrics[pending[inside]] = barycentrics[inside]
+
+        hits = np.flatnonzero(sampleTriangles >= 0)
+        colors, normals = Shade(sampleTriangles[hits], sampleBarycentrics[hits])
+        owners = hits // sampleCount
+        counts = np.bincount(owners, minlength=len(texelY))
+        colorSums = np.stack([np.bincount(owners, colors[:, channel], len(texelY)) for channel in range(3)], axis=1)
+        normalSums = np.stack([np.bincount(owners, normals[:, channel], len(texelY)) for channel in range(3)], axis=1)
+
+        resolved = counts > 0 #Texels none of whose samples hit a triangle keep their single sample
+        ys = texelY[resolved]
+        xs = texelX[resolved]
+        colorMap[ys, xs, :3] = colorSums[resolved] / counts[resolved, None]
+        colorMap[ys, xs, 3] = counts[resolved] / sampleCount
+        normalMap[ys, xs] = Normalize(normalSums[resolved]) * 0.5 + 0.5
+
+def SampleMaterials(uvs, materialIds, materials): #Samples color and tangent space normals for texels of mixed materials
+    colors = np.zeros((len(uvs), 3), dtype=np.float32)
+    normals = np.empty((len(uvs), 3), dtype=np.float32)
+    normals[:] = FLAT_NORMAL
+
+    for materialId in np.unique(materialIds):
+        if materialId < 0 or materialId >= len(materials): #Faces without a material stay black and flat
+            continue
+        selection = materialIds == materialId
+        material = materials[materialId]
+        colors[selection] = material.SampleColor(uvs[selection])
+        normals[selection] = material.SampleNormal(uvs[selection])
+
+    return colors, normals
@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from ImageIO import QuantizeImage
+from TextureTransfer import MaterialTextures, TransferTextures
+
+workerInputs = {} #Bake inputs of the current worker process, filled in by LoadWorkerInputs
+
+class BakeCancelled(Exception): #Raised by BakeTiled when shouldCancel asks it to stop between tiles
+    pass
+
+def BakeTiled(positions, triangles, sourceUVs, targetUVs, materialIds, materials, resolution, scratchDirectory, tileSize=1024, workers=None, progress=None, superSampling=1, shouldCancel=None, normalBitDepth=8):
+    #Bakes a resolution x resolution map tile by tile in a process pool, straight into memory-mapped buffers in scratchDirectory
+    #Only one tile per worker is ever resident, so peak memory follows the tile size rather than the texture size
+    #progress(window, colorBuffer) is called as each tile finishes, shouldCancel() is checked between tiles
+    #Returns writable (resolution, resolution, 4) uint8 color and (resolution, resolution, 3) normal memmaps of normalBitDepth bits
+    os.makedirs(scratchDirectory, exist_ok=True)
+    targetUVs = np.asarray(targetUVs, dtype=np.float64)
+
+    #Inputs go to disk once and every worker maps them instead of receiving its own pickled copy
+    inputPaths = {}
+    for name, array in (("positions", positions), ("triangles", triangles), ("sourceUVs", sourceUVs), ("targetUVs", targetUVs), ("materialIds", materialIds)):
+        inputPaths[name] = os.path.join(scratchDirectory, f"{name}.npy")
+        np.save(inputPaths[name], np.asarray(array))
+    inputPaths["materials"] = SaveMaterials(materials, scratchDirectory)
+
+    inputPaths["color"] = os.path.join(scratchDirectory, "color.npy")
+    inputPaths["normal"] = os.path.join(scratchDirectory, "normal.npy")
+    colorBuffer = np.lib.format.open_memmap(inputPaths["color"], mode="w+", dtype=np.uint8, shape=(resolution, resolution, 4))
+    normalBuffer = np.lib.format.open_memmap(inputPaths["normal"], mode="w+", dtype=np.uint8 if normalBitDepth == 8 else np.uint16, shape=(resolution, resolution, 3))
+    normalBuffer[:] = QuantizeImage(np.array([0.5, 0.5, 1.0]), normalBitDepth) #Tiles without any triangles are never baked and keep a flat normal
+    del colorBuffer, normalBuffer
+
+    tiles = BinTrianglesIntoTiles(targetUVs, resolution, tileSize)
+    workers = workers or os.cpu_count() or 1
+    colorPreview = np.load(inputPaths["color"], mmap_mode="r") if progress else None #Lets progress look at finished tiles
+    try:
+        if workers == 1:
+            LoadWorkerInputs(inputPaths, resolution, superSampling)
+            for window, triangleIds in tiles:
+                if shouldCancel and shouldCancel():
+                    raise BakeCancelled()
+                BakeTile(window, triangleIds)
+                if progress:
+                    progress(window, colorPreview)
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, max(len(tiles), 1)), mp_context=GetProcessContext(), initializer=LoadWorkerInputs, initargs=(inputPaths, resolution, superSampling)) as executor:
+                futures = [executor.submit(BakeTile, window, triangleIds) for window, triangleIds in tiles]
+                for future in as_completed(futures):
+                    window = future.result()
+                    if progress:
+                        progress(window, colorPreview)
+                    if shouldCancel and shouldCancel():
+                        for pendingFuture in futures: #Tiles already running finish, the rest never start
+                            pendingFuture.cancel()
+                        raise BakeCancelled()
+    finally: #Release the memmaps held by this process so the scratch files can be removed
+        workerInputs.clear()
+        colorPreview = None
+
+    return np.load(inputPaths["color"], mmap_mode="r+"), np.load(inputPaths["normal"], mmap_mode="r+") #Writable so dilation can run in place
+
+def BinTrianglesIntoTiles(targetUVs, resolution, tileSize): #Returns [((x0, y0, x1, y1), triangleIds)] for every tile touched by a triangle
+    pixelX = targetUVs[:, :, 0] * resolution - 0.5
+    pixelY = (1.0 - targetUVs[:, :, 1]) * resolution - 0.5
+    tileCount = (resolution + tileSize - 1) // tileSize
+    #Triangles one texel outside a tile still count, supersampling looks at the neighbours of the tile's border texels
+    minTileX = np.clip((np.floor(pixelX.min(axis=1)) - 1) // tileSize, 0, tileCount - 1).astype(np.int64)
+    maxTileX = np.clip((np.ceil(pixelX.max(axis=1)) + 1) // tileSize, 0, tileCount - 1).astype(np.int64)
+    minTileY = np.clip((np.floor(pixelY.min(axis=1)) - 1) // tileSize, 0, tileCount - 1).astype(np.int64)
+    maxTileY = np.clip((np.ceil(pixelY.max(axis=1)) + 1) // tileSize, 0, tileCount - 1).astype(np.int64)
+
+    #Expand every triangle into one entry per overlapped tile, then group the entries by tile
+    spanX = maxTileX - minTileX + 1
+    spanY = maxTileY - minTileY + 1
+    counts = spanX * spanY
+    triangleIds = np.repeat(np.arange(len(targetUVs)), counts)
+    local = np.arange(len(triangleIds)) - np.repeat(np.cumsum(counts) - counts, counts)
+    tileX = minTileX[triangleIds] + local % spanX[triangleIds]
+    tileY = minTileY[triangleIds] + local // spanX[triangleIds]
+    tileIds = tileY * tileCount + tileX
+
+    order = np.argsort(tileIds, kind="stable")
+    tileIds = tileIds[order]
+    triangleIds = triangleIds[order]
+    uniqueTiles, starts = np.unique(tileIds, return_index=True)
+    groups = np.split(triangleIds, starts[1:])
+
+    tiles = []
+    for tileId, group in zip(uniqueTiles, groups):
+        x0 = int(tileId % tileCount) * tileSize
+        y0 = int(tileId // tileCount) * tileSize
+        tiles.append(((x0, y0, min(x0 + tileSize, resolution), min(y0 + tileSize, resolution)), group))
+    return tiles
+
+def SaveMaterials(materials, scratchDirectory): #Writes material images as .npy files and returns picklable descriptions
+    savedImages = {} #Materials often share the same decoded image
+    descriptions = []
+    for material in materials:
+        paths = []
+        for image in (material.colorMap, material.normalMap):
+            if image is None:
+                paths.append("")
+                continue
+            if id(image) not in savedImages:
+                savedImages[id(image)] = os.path.join(scratchDirectory, f"image{len(savedImages)}.npy")
+                np.save(savedImages[id(image)], np.asarray(image)) #Kept in their decoded integer format
+            paths.append(savedImages[id(image)])
+        descriptions.append((material.name, tuple(float(value) for value in material.color), paths[0], paths[1]))
+    return descriptions
+
+def LoadWorkerInputs(inputPaths, resolution, superSampling=1):
+    images = {}
+    def LoadImage(path):
+        if path and path not in images:
+            images[path] = np.load(path, mmap_mode="r")
+        return images.get(path)
+
+    workerInputs.clear()
+    for name in ("positions", "triangles", "sourceUVs", "targetUVs", "materialIds"):
+        workerInputs[name] = np.load(inputPaths[name], mmap_mode="r")
+    workerInputs["materials"] = [MaterialTextures(name, color, LoadImage(colorPath), LoadImage(normalPath)) for name, color, colorPath, normalPath in inputPaths["materials"]]
+    workerInputs["color"] = np.load(inputPaths["color"], mmap_mode="r+")
+    workerInputs["normal"] = np.load(inputPaths["normal"], mmap_mode="r+")
+    workerInputs["resolution"] = resolution
+    workerInputs["superSampling"] = superSampling
+
+def BakeTile(window, triangleIds):
+    colorTile, normalTile = TransferTextures(workerInputs["positions"], workerInputs["triangles"][triangleIds], workerInputs["sourceUVs"][triangleIds],
+                                             workerInputs["targetUVs"][triangleIds], workerInputs["materialIds"][triangleIds], workerInputs["materials"],
+                                             workerInputs["resolution"], workerInputs["resolution"], window, workerInputs["superSampling"])
+    x0, y0, x1, y1 = window
+    workerInputs["color"][y0:y1, x0:x1] = QuantizeImage(colorTile)
+    workerInputs["normal"][y0:y1, x0:x1] = QuantizeImage(normalTile, 16 if workerInputs["normal"].dtype == np.uint16 else 8)
+    workerInputs["color"].flush()
+    workerInputs["normal"].flush()
+    return window
+
+def GetProcessContext(): #Spawned workers have to run mayapy when the bake is started from inside the Maya GUI
+    context = multiprocessing.get_context("spawn")
+    executableName = os.path.basename(sys.executable).lower()
+    if executableName.startswith("maya") and not executableName.startswith("mayapy"):
+        context.set_executable(os.path.join(os.path.dirname(sys.executable), "mayapy.exe" if os.name == "nt" else "mayapy"))
+    return context
@@ -0,0 +1,293 @@
+import numpy as np
+
+from MeshSnapshot import FanTriangulate
+from TextureTransfer import Normalize, RasterizeTriangles
+
+#For each of the six chart directions (+X, -X, +Y, -Y, +Z, -Z) the (u, v) axes as signed position columns
+#u x v always equals the direction so charts are never mirrored
+PROJECTION_AXES = (((1, 1), (2, 1)), ((1, -1), (2, 1)), ((2, 1), (0, 1)), ((0, 1), (2, 1)), ((0, 1), (1, 1)), ((0, -1), (1, 1)))
+MAX_LAYOUT_PASSES = 4 #Layouts tried while splitting overlapping faces off their charts
+PACK_FILL = 0.8 #Share of the atlas skyline packs usually fill with padded charts, where the density search starts
+
+def GenerateAtlas(positions, faceVertexCounts, faceVertexIds, resolution, padding=4, faceScales=None, triangleFaceVertices=None):
+    #Lays out non-overlapping uvs for a polygon mesh in the 0-1 square with padding texels between charts
+    #Charts are sized by surface area, or scaled by the largest of their faceScales when given
+    #triangleFaceVertices is the (T, 3) triangulation the uvs are baked with, a fan over every polygon when not given
+    #Returns (uvs (N, 2), uvIds with one uv id per face-vertex), in the layout of MFnMesh.setUVs and assignUVs
+    positions = np.asarray(positions, dtype=np.float64)[:, :3]
+    faceVertexCounts = np.asarray(faceVertexCounts, dtype=np.int64)
+    faceVertexIds = np.asarray(faceVertexIds, dtype=np.int64)
+    triangleFaceVertices = np.asarray(triangleFaceVertices if triangleFaceVertices is not None else FanTriangulate(faceVertexCounts), dtype=np.int64).reshape(-1, 3)
+
+    faceIds = np.repeat(np.arange(len(faceVertexCounts)), faceVertexCounts)
+    faceStarts = np.cumsum(faceVertexCounts) - faceVertexCounts
+    nextFaceVertex = np.arange(len(faceVertexIds)) + 1
+    faceEnds = faceStarts + faceVertexCounts
+    nextFaceVertex[faceEnds - 1] = faceStarts #The last face-vertex of every face wraps around to the first
+    nextVertexIds = faceVertexIds[nextFaceVertex]
+
+    #Every triangle has to keep a positive area in its chart's projection, otherwise it folds over its neighbours
+    corners = positions[faceVertexIds[triangleFaceVertices]]
+    triangleNormals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    triangleFaces = faceIds[triangleFaceVertices[:, 0]]
+    faceNormals = FaceNormals(positions, faceVertexIds, nextVertexIds, faceStarts)
+    directions, planeNormals = UnfoldedDirections(FaceDirections(faceNormals), triangleNormals, triangleFaces)
+
+    #Charts that still cover a texel twice, like a ramp winding over itself, have the overlapping faces split off into their own charts
+    isolated = directions < 0
+    fill = PACK_FILL #Later passes start from the fill the last one reached
+    for _ in range(MAX_LAYOUT_PASSES):
+        chartIds = SegmentCharts(directions, faceIds, faceVertexIds, nextVertexIds, len(positions), isolated)
+        uvs, uvIds, fill = LayoutCharts(positions, faceIds, faceVertexIds, chartIds, directions, planeNormals, resolution, padding, faceScales, fill)
+        overlapping = OverlappingFaces(uvs[uvIds[triangleFaceVertices]], triangleFaces, len(faceVertexCounts), resolution) & ~isolated
+        if not np.any(overlapping): #Faces that fold over themselves are already alone and cannot be split any further
+            break
+        isolated |= overlapping
+    return uvs, uvIds
+
+def LayoutCharts(positions, faceIds, faceVertexIds, chartIds, directions, planeNormals, resolution, padding, faceScales, fill=PACK_FILL):
+    #Every (chart, vertex) pair becomes one uv so vertices stay welded inside a chart and split along chart borders
+    chartCount = chartIds.max() + 1
+    pairKeys = chartIds[faceIds] * len(positions) + faceVertexIds
+    uniqueKeys, uvIds = np.unique(pairKeys, return_inverse=True)
+    uvCharts = uniqueKeys // len(positions)
+    uvVertices = uniqueKeys % len(positions)
+    chartDirections = np.zeros(chartCount, dtype=np.int64)
+    chartDirections[chartIds] = directions
+    chartPlaneNormals = np.zeros((chartCount, 3))
+    chartPlaneNormals[chartIds] = planeNormals #Only used by the single face charts of direction -1
+    projected = ProjectCharts(positions[uvVertices], chartDirections[uvCharts], chartPlaneNormals[uvCharts])
+    if faceScales is not None:
+        chartScales = np.zeros(chartCount)
+        np.maximum.at(chartScales, chartIds, np.asarray(faceScales, dtype=np.float64))
+        projected *= chartScales[uvCharts][:, None]
+
+    #Charts taller than they are wide are turned a quarter, the packer fills rows of wide charts tighter
+    chartMin, chartMax = ChartBounds(projected, uvCharts, chartCount)
+    rotatedUVs = ((chartMax[:, 1] - chartMin[:, 1]) > (chartMax[:, 0] - chartMin[:, 0]))[uvCharts]
+    projected[rotatedUVs] = np.column_stack((projected[rotatedUVs, 1], -projected[rotatedUVs, 0]))
+    chartMin, chartMax = ChartBounds(projected, uvCharts, chartCount)
+
+    texelsPerUnit, chartOrigins = PackCharts(chartMax - chartMin, resolution, padding, fill)
+    uvs = ((projected - chartMin[uvCharts]) * texelsPerUnit + chartOrigins[uvCharts] + padding * 0.5) / resolution
+    return uvs, uvIds, PaddedArea(chartMax - chartMin, padding, texelsPerUnit) / (resolution * resolution)
+
+def WeightedFaceScales(faceCounts, areas, weights):
+    #faceScales for GenerateAtlas that give each mesh a share of the atlas proportional to its weight instead of its area
+    scales = np.sqrt(np.asarray(weights, dtype=np.float64) / np.maximum(np.asarray(areas, dtype=np.float64), 1e-24))
+    return np.repeat(scales / max(scales.max(), 1e-24), faceCounts)
+
+def ChartBounds(projected, uvCharts, chartCount):
+    chartMin = np.full((chartCount, 2), np.inf)
+    chartMax = np.full((chartCount, 2), -np.inf)
+    np.minimum.at(chartMin, uvCharts, projected)
+    np.maximum.at(chartMax, uvCharts, projected)
+    return chartMin, chartMax
+
+def FaceNormals(positions, faceVertexIds, nextVertexIds, faceStarts): #Area weighted polygon normals with Newell's method
+    current = positions[faceVertexIds]
+    following = positions[nextVertexIds]
+    newell = np.column_stack(((current[:, 1] - following[:, 1]) * (current[:, 2] + following[:, 2]),
+                              (current[:, 2] - following[:, 2]) * (current[:, 0] + following[:, 0]),
+                              (current[:, 0] - following[:, 0]) * (current[:, 1] + following[:, 1])))
+    return np.add.reduceat(newell, faceStarts, axis=0) * 0.5
+
+def FaceDirections(faceNormals): #Index into PROJECTION_AXES of the axis each face normal points along the most
+    axes = np.argmax(np.abs(faceNormals), axis=1)
+    negative = faceNormals[np.arange(len(faceNormals)), axes] < 0
+    return axes * 2 + negative
+
+def UnfoldedDirections(directions, triangleNormals, triangleFaces):
+    #Returns (direction, plane normal) per face so that every triangle of the face keeps a positive area in its projection
+    #A warped polygon can have a triangle facing away from its dominant axis, which would project mirrored. It takes the axis its
+    #least facing triangle faces the most instead, or direction -1 when no axis works and it is projected onto its own plane
+    lengths = np.linalg.norm(triangleNormals, axis=1)
+    valid = lengths > 1e-12 * max(lengths.max(initial=0.0), 1e-300) #Degenerate triangles cover no texels in any projection
+    facing = np.repeat(triangleNormals[valid] / lengths[valid, None], 2, axis=1) * np.tile([1.0, -1.0], 3) #Cosine to each of the six directions
+    leastFacing = np.full((len(directions), len(PROJECTION_AXES)), np.inf)
+    np.minimum.at(leastFacing, triangleFaces[valid], facing)
+    faces = np.arange(len(directions))
+    bestDirections = np.argmax(leastFacing, axis=1)
+    folded = leastFacing[faces, directions] <= 0
+    directions = np.where(folded, np.where(leastFacing[faces, bestDirections] > 0, bestDirections, -1), directions)
+
+    planeNormals = np.zeros((len(directions), 3)) #Sum of unit triangle normals, which every triangle of a polygon folded less than half way round faces
+    np.add.at(planeNormals, triangleFaces[valid], triangleNormals[valid] / lengths[valid, None])
+    return directions, Normalize(planeNormals)
+
+def SegmentCharts(directions, faceIds, faceVertexIds, nextVertexIds, vertexCount, isolated=None):
+    #Connected groups of faces that share an edge and face the same direction, numbered 0 to charts - 1
+    #Faces marked isolated always get a chart of their own
+
+    #Face-vertex edges sorted by their undirected key put the faces on either side of an edge next to each other
+    edgeKeys = np.minimum(faceVertexIds, nextVertexIds) * vertexCount + np.maximum(faceVertexIds, nextVertexIds)
+    order = np.argsort(edgeKeys, kind="stable")
+    sortedKeys = edgeKeys[order]
+    sortedFaces = faceIds[order]
+    shared = sortedKeys[1:] == sortedKeys[:-1]
+    faceA = sortedFaces[:-1][shared]
+    faceB = sortedFaces[1:][shared]
+    joined = directions[faceA] == directions[faceB]
+    if isolated is not None:
+        joined &= ~(isolated[faceA] | isolated[faceB])
+    faceA = faceA[joined]
+    faceB = faceB[joined]
+
+    #Vectorized union find, hooking both ends of every edge to the smaller label and jumping pointers until stable
+    labels = np.arange(len(directions))
+    while True:
+        smallest = np.minimum(labels[faceA], labels[faceB])
+        previous = labels.copy()
+        np.minimum.at(labels, labels[faceA], smallest)
+        np.minimum.at(labels, labels[faceB], smallest)
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            break
+    return np.unique(labels, return_inverse=True)[1]
+
+def OverlappingFaces(triangleUVs, triangleFaces, faceCount, resolution, stripTexels=1 << 22):
+    #Marks the faces of every triangle that covers a texel center another triangle covers too, texels on shared edges do not count
+    #Works through strips of about stripTexels texels so the coverage count stays small at any resolution
+    overlapping = np.zeros(faceCount, dtype=bool)
+    stripHeight = max(stripTexels // resolution, 1)
+    for stripStart in range(0, resolution, stripHeight):
+        stripEnd = min(stripStart + stripHeight, resolution)
+        texels = []
+        triangles = []
+        for triangleIds, xs, ys, barycentrics in RasterizeTriangles(triangleUVs, resolution, resolution, (0, stripStart, resolution, stripEnd)):
+            interior = np.all(barycentrics > 1e-5, axis=1)
+            texels.append((ys[interior] - stripStart) * resolution + xs[interior])
+            triangles.append(triangleIds[interior])
+        if not texels:
+            continue
+        texels = np.concatenate(texels)
+        triangles = np.concatenate(triangles)
+        coverage = np.bincount(texels, minlength=(stripEnd - stripStart) * resolution)
+        overlapping[triangleFaces[triangles[coverage[texels] > 1]]] = True
+    return overlapping
+
+def ProjectCharts(positions, directions, planeNormals): #Planar projection of each position along its chart direction, or onto its plane for direction -1
+    projected = np.empty((len(positions), 2))
+    for direction, ((uAxis, uSign), (vAxis, vSign)) in enumerate(PROJECTION_AXES):
+        selection = directions == direction
+        projected[selection, 0] = positions[selection, uAxis] * uSign
+        projected[selection, 1] = positions[selection, vAxis] * vSign
+
+    selection = directions < 0
+    if np.any(selection): #u x v equals the plane normal, as for the axis directions
+        normals = planeNormals[selection]
+        helper = np.where(np.abs(normals[:, 0:1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]])
+        uAxes = Normalize(np.cross(helper, normals))
+        vAxes = np.cross(normals, uAxes)
+        projected[selection, 0] = np.sum(positions[selection] * uAxes, axis=1)
+        projected[selection, 1] = np.sum(positions[selection] * vAxes, axis=1)
+    return projected
+
+def PackCharts(chartSizes, resolution, padding, fill=PACK_FILL):
+    #Finds the largest texel density at which every chart fits in the atlas, returns (texelsPerUnit, chart origins in texels)
+    #The height a pack needs grows with the padded chart area, so the next density is interpolated from the packs on either side of the atlas height
+    #instead of bisected, which settles large layouts in a few packs, starting from the density whose padded chart area covers fill of the atlas
+    chartSizes = np.asarray(chartSizes, dtype=np.float64)
+    totalArea = max(np.sum(chartSizes[:, 0] * chartSizes[:, 1]), 1e-24)
+    longestSide = max(np.max(chartSizes), 1e-12)
+    if len(chartSizes) * padding * padding > resolution * resolution: #Their padding alone is more than the atlas
+        raise ValueError(f"{len(chartSizes)} uv charts do not fit in a {resolution} texture with {padding} texels of padding")
+    lower = 0.0
+    upper = min(resolution / np.sqrt(totalArea), (resolution - padding) / longestSide)
+    lowerPack = upperPack = None #(padded area, height) of the densest pack that fit and the sparsest one that did not
+    best = None
+    density = min(PaddedAreaDensity(chartSizes, padding, resolution * resolution * fill), upper)
+    for _ in range(16):
+        origins, height = PackSkyline(chartSizes * density, resolution, padding)
+        pack = (PaddedArea(chartSizes, padding, density), float(height))
+        if height <= resolution:
+            lower, lowerPack, best = density, pack, (density, origins)
+        else:
+            upper, upperPack = density, pack
+        if upper - lower < lower * 1e-3: #Close enough that another pack would not move a chart by a texel
+            break
+        if lowerPack and upperPack and np.isfinite(upperPack[1]):
+            area = lowerPack[0] + (resolution - lowerPack[1]) * (upperPack[0] - lowerPack[0]) / max(upperPack[1] - lowerPack[1], 1.0)
+        else: #Only one side known yet, assume the pack keeps filling its strip as tightly
+            area = pack[0] * resolution / min(pack[1], 2.0 * resolution)
+        guess = PaddedAreaDensity(chartSizes, padding, area)
+        if height <= resolution and guess <= lower * (1.0 + 1e-3): #Any denser layout already needs more than the atlas height
+            break
+        margin = (upper - lower) * 0.02 #Keeps every step shrinking the bracket when the guess lands on one of its ends
+        density = min(max(guess, lower + margin), upper - margin)
+    if best is None: #Not even the smallest density tried fits, every chart shrinks to its padding
+        origins, height = PackSkyline(chartSizes * 0.0, resolution, padding)
+        if height > resolution:
+            raise ValueError(f"{len(chartSizes)} uv charts do not fit in a {resolution} texture with {padding} texels of padding")
+        best = (0.0, origins)
+    return best
+
+def PaddedArea(chartSizes, padding, density): #Texels the charts cover at density once PackSkyline rounds them up and pads them
+    return np.sum((chartSizes[:, 0] * density + padding + 0.5) * (chartSizes[:, 1] * density + padding + 0.5))
+
+def PaddedAreaDensity(chartSizes, padding, area): #Density at which PaddedArea reaches area, the positive root of its quadratic
+    quadratic = np.sum(chartSizes[:, 0] * chartSizes[:, 1])
+    linear = (padding + 0.5) * np.sum(chartSizes[:, 0] + chartSizes[:, 1])
+    constant = len(chartSizes) * (padding + 0.5) ** 2 - area
+    if quadratic <= 0.0:
+        return max(-constant / max(linear, 1e-24), 0.0)
+    return max((-linear + np.sqrt(max(linear * linear - 4.0 * quadratic * constant, 0.0))) / (2.0 * quadratic), 0.0)
+
+def PackSkyline(sizes, resolution, padding):
+    #Bottom-left skyline packing of (N, 2) texel sized rectangles into a strip resolution texels wide
+    #Returns (N, 2) origins and the height the strip needed, the rectangles fit in the atlas when that is at most resolution
+    widths = np.ceil(sizes[:, 0]).astype(np.int64) + padding
+    heights = np.ceil(sizes[:, 1]).astype(np.int64) + padding
+    order = np.lexsort((np.arange(len(sizes)), -widths, -heights)) #Tallest first, ties broken by index for a stable layout
+    origins = np.zeros((len(sizes), 2))
+
+    skyline = [[0, 0, resolution]] #Segments of [x, y, width] covering the atlas from left to right
+    top = 0
+    for chart in order:
+        width = int(widths[chart])
+        height = int(heights[chart])
+        bestY = bestX = bestIndex = None
+        for index in range(len(skyline)):
+            x = skyline[index][0]
+            if x + width > resolution:
+                break
+            #The rectangle rests on the highest segment it spans
+            y = 0
+            remaining = width
+            spanIndex = index
+            while remaining > 0:
+                segment = skyline[spanIndex]
+                if segment[1] > y:
+                    y = segment[1]
+                remaining -= segment[2]
+                spanIndex += 1
+            if bestY is None or y < bestY:
+                bestY, bestX, bestIndex = y, x, index
+        if bestY is None: #Wider than the atlas
+            return origins, np.inf
+
+        origins[chart] = (bestX, resolution - bestY - height) #Skyline grows down from the top, uvs grow up from the bottom
+        top = max(top, bestY + height)
+        if top > 2 * resolution: #Far past the atlas, the caller only needs to know it overflowed
+            return origins, np.inf
+        AddSkylineLevel(skyline, bestIndex, bestX, bestY + height, width)
+    return origins, top
+
+def AddSkylineLevel(skyline, index, x, y, width): #Raises the skyline to y over [x, x + width) and merges equal neighbours
+    end = x + width
+    newSegments = [[x, y, width]]
+    while index < len(skyline) and skyline[index][0] < end:
+        segmentX, segmentY, segmentWidth = skyline.pop(index)
+        if segmentX + segmentWidth > end: #Keep the part of the last covered segment sticking out on the right
+            newSegments.append([end, segmentY, segmentX + segmentWidth - end])
+    skyline[index:index] = newSegments
+
+    #Only the new segments and their direct neighbours can have become level with each other
+    mergeIndex = max(index - 1, 0)
+    lastIndex = min(index + len(newSegments), len(skyline) - 1)
+    while mergeIndex < lastIndex:
+        if skyline[mergeIndex][1] == skyline[mergeIndex + 1][1]:
+            skyline[mergeIndex][2] += skyline.pop(mergeIndex + 1)[2]
+            lastIndex -= 1
+        else:
+            mergeIndex += 1
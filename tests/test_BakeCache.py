@@ -0,0 +1,68 @@
+import json
+import multiprocessing
+import os
+
+from BakeCache import BakeCache
+
+SUFFIXES = ("_color.png", "_normal.png")
+
+def WriteOutputs(directory, filename, size=1000):
+    for suffix in SUFFIXES:
+        with open(os.path.join(directory, filename + suffix), "wb") as file:
+            file.write(os.urandom(size))
+
+def testMissThenHit(tmp_path):
+    cache = BakeCache(str(tmp_path / "cache"))
+    outputs = tmp_path / "outputs"
+    outputs.mkdir()
+    assert not cache.Lookup("key", str(outputs), "asset")
+
+    WriteOutputs(str(outputs), "asset")
+    cache.Store("key", str(outputs), "asset", SUFFIXES)
+    restored = tmp_path / "restored"
+    restored.mkdir()
+    assert cache.Lookup("key", str(restored), "other")
+    for suffix in SUFFIXES:
+        assert (restored / ("other" + suffix)).read_bytes() == (outputs / ("asset" + suffix)).read_bytes()
+    assert cache.GetStats() == {"hits": 1, "misses": 1, "evictions": 0}
+
+def testEvictsLeastRecentlyUsed(tmp_path):
+    cache = BakeCache(str(tmp_path / "cache"), maxBytes=5000) #Room for two entries of two 1000 byte files
+    outputs = str(tmp_path)
+    for index, key in enumerate(("first", "second")):
+        WriteOutputs(outputs, key)
+        cache.Store(key, outputs, key, SUFFIXES)
+        os.utime(os.path.join(cache.directory, key, "entry.json"), (index, index)) #Modification time is the last use
+    assert cache.Lookup("first", outputs, "first") #Now the most recently used
+
+    WriteOutputs(outputs, "third")
+    cache.Store("third", outputs, "third", SUFFIXES)
+    assert sorted(key for key in os.listdir(cache.directory) if not key.startswith(".")) == ["first", "third"]
+    assert not cache.Lookup("second", outputs, "second")
+    assert cache.GetStats()["evictions"] == 1
+
+def testCorruptEntryIsAMiss(tmp_path):
+    cache = BakeCache(str(tmp_path / "cache"))
+    WriteOutputs(str(tmp_path), "asset")
+    cache.Store("key", str(tmp_path), "asset", SUFFIXES)
+    os.remove(os.path.join(cache.directory, "key", SUFFIXES[1]))
+    assert not cache.Lookup("key", str(tmp_path), "restored")
+
+def RecordHits(directory, count):
+    cache = BakeCache(directory)
+    for _ in range(count):
+        cache.RecordStat("hits")
+
+def testConcurrentWorkersShareOneStatsFile(tmp_path):
+    directory = BakeCache(str(tmp_path / "cache")).directory
+    for pid in (101, 102): #Left behind by workers of older versions, which counted in a file per process
+        with open(os.path.join(directory, f".stats.{pid}.json"), "w") as file:
+            json.dump({"hits": 2, "misses": 1}, file)
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=RecordHits, args=(directory, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert BakeCache(directory).GetStats() == {"hits": 104, "misses": 2, "evictions": 0}
+    assert sorted(os.listdir(directory)) == [".stats.json"]
@@ -0,0 +1,80 @@
+import json
+import os
+
+import numpy as np
+
+from BatchConverter import ConvertMeshFile, LoadConfig, ReadManifest, RunBatch
+from ImageIO import ReadImage, WritePng
+from MeshSnapshot import MeshSnapshot
+from UVAtlas import OverlappingFaces
+
+OBJ = """mtllib quad.mtl
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vt 1 0
+vt 1 1
+vt 0 1
+usemtl painted
+f 1/1 2/2 3/3 4/4
+"""
+
+def WriteAssets(directory):
+    os.makedirs(directory / "sub")
+    for path in (directory / "quad.obj", directory / "sub" / "quad.obj"):
+        path.write_text(OBJ)
+        (path.parent / "quad.mtl").write_text("newmtl painted\nmap_Kd color.png\n")
+        WritePng(str(path.parent / "color.png"), np.random.default_rng(0).integers(0, 256, (8, 8, 3), dtype=np.uint8))
+
+def Run(inputDirectory, config, manifestPath, capsys):
+    assert RunBatch(str(inputDirectory), config, manifestPath) == 0
+    return capsys.readouterr().out.splitlines()[0]
+
+def testManifestResume(tmp_path, capsys):
+    WriteAssets(tmp_path / "input")
+    config = LoadConfig(None)
+    config.update(resolution=32, workers=1, createUVs=True, outputDirectory=str(tmp_path / "input" / "converted")) #Written meshes are never picked up as assets
+    manifestPath = os.path.join(config["outputDirectory"], "manifest.jsonl")
+
+    assert Run(tmp_path / "input", config, manifestPath, capsys).startswith("2 assets to convert")
+    finished = ReadManifest(manifestPath)
+    assert sorted(finished) == ["quad.obj", os.path.join("sub", "quad.obj")]
+    for asset, outputName in (("quad.obj", "quad"), (os.path.join("sub", "quad.obj"), "sub_quad")):
+        assert finished[asset]["outputs"] == [f"{outputName}_color.png", f"{outputName}_normal.png", f"{outputName}.obj", f"{outputName}.mtl"]
+        for output in finished[asset]["outputs"]:
+            assert os.path.exists(os.path.join(config["outputDirectory"], output))
+
+    assert Run(tmp_path / "input", config, manifestPath, capsys).startswith("0 assets to convert")
+
+    #A changed asset or a changed setting converts again, the worker count does not
+    os.utime(tmp_path / "input" / "quad.obj", (0, 0))
+    config["workers"] = 2
+    assert Run(tmp_path / "input", config, manifestPath, capsys).startswith("1 assets to convert")
+    config["resolution"] = 64
+    assert Run(tmp_path / "input", config, manifestPath, capsys).startswith("2 assets to convert")
+
+def testPartialManifestLinesAreIgnored(tmp_path):
+    manifestPath = tmp_path / "manifest.jsonl"
+    manifestPath.write_text(json.dumps({"asset": "done.obj", "status": "done", "stamp": {}}) + "\n" + json.dumps({"asset": "failed.obj", "status": "failed"}) + "\n{\"asset\": \"cut")
+    assert list(ReadManifest(str(manifestPath))) == ["done.obj"]
+
+def testCombinedMeshesShareOneAtlas(tmp_path):
+    #Both nodes of the quad file use the whole 0-1 square, so a combined bake has to lay out new uvs and write the mesh that uses them
+    from test_MeshSnapshot import PngBytes, QuadGltf, WriteGlb
+    WriteGlb(tmp_path / "scene.glb", *QuadGltf(PngBytes((255, 0, 0))))
+    config = LoadConfig(None)
+    config.update(resolution=64, workers=1, combineMeshes=True, outputDirectory=str(tmp_path))
+    result = ConvertMeshFile(str(tmp_path / "scene.glb"), "scene", config)
+    assert result["outputs"] == ["scene_color.png", "scene_normal.png", "scene.obj", "scene.mtl"]
+
+    mesh = MeshSnapshot.FromFile(str(tmp_path / "scene.obj"))
+    assert len(mesh.faceVertexCounts) == 4 and mesh.materials[0][2] == str(tmp_path / "scene_color.png")
+    triangleUVs = mesh.TriangleUVs()
+    assert not OverlappingFaces(triangleUVs, mesh.FaceIds()[mesh.triangleFaceVertices[:, 0]], 4, 64).any()
+    coverage = ReadImage(str(tmp_path / "scene_color.png"))[:, :, 3] > 0
+    assert 0.1 < coverage.mean() < 0.9 #Two charts with padding between them, not one quad over the other
+
+    config["combineMeshes"] = False
+    assert ConvertMeshFile(str(tmp_path / "scene.glb"), "scene", config)["outputs"] == ["scene_left_color.png", "scene_left_normal.png", "scene_right_color.png", "scene_right_normal.png"]
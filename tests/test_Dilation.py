@@ -0,0 +1,57 @@
+import numpy as np
+
+from Dilation import DilateMaps
+
+def BlobMaps(size=48, seed=0):
+    #Float color map with a few covered discs, every covered texel gets a color of its own so fills can be traced back to their source
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size]
+    covered = np.zeros((size, size), dtype=bool)
+    for centerX, centerY, radius in zip(rng.uniform(0, size, 4), rng.uniform(0, size, 4), rng.uniform(2, 6, 4)):
+        covered |= (x - centerX) ** 2 + (y - centerY) ** 2 <= radius ** 2
+    colorMap = np.zeros((size, size, 4), dtype=np.float32)
+    colorMap[:, :, 0] = (y * size + x) / float(size * size)
+    colorMap[:, :, 3] = covered
+    colorMap[~covered, :3] = -1.0
+    return colorMap, covered
+
+def BruteForceDistances(covered): #Squared distance from every texel to its nearest covered texel
+    coveredY, coveredX = np.nonzero(covered)
+    y, x = np.mgrid[0:covered.shape[0], 0:covered.shape[1]]
+    return ((y[:, :, None] - coveredY) ** 2 + (x[:, :, None] - coveredX) ** 2).min(axis=2)
+
+def testMatchesBruteForceNearestTexelFill():
+    padding = 5
+    colorMap, covered = BlobMaps()
+    original = colorMap.copy()
+    DilateMaps(colorMap, None, padding)
+
+    size = covered.shape[0]
+    distances = BruteForceDistances(covered)
+    filled = colorMap[:, :, 0] >= 0
+    np.testing.assert_array_equal(filled, distances <= padding * padding)
+    np.testing.assert_array_equal(colorMap[:, :, 3], original[:, :, 3]) #Alpha keeps marking the real coverage
+    np.testing.assert_array_equal(colorMap[covered], original[covered])
+
+    #Ties between equally near texels may go either way, the distance to the texel the color came from may not
+    sourceIds = np.rint(colorMap[filled & ~covered, 0] * size * size).astype(np.int64)
+    sourceY, sourceX = np.divmod(sourceIds, size)
+    targetY, targetX = np.nonzero(filled & ~covered)
+    assert np.all(covered[sourceY, sourceX])
+    np.testing.assert_array_equal((sourceY - targetY) ** 2 + (sourceX - targetX) ** 2, distances[targetY, targetX])
+
+def testStripsMatchOnePass():
+    colorMap, covered = BlobMaps(seed=1)
+    inStrips = colorMap.copy()
+    DilateMaps(colorMap, None, 4, stripHeight=1 << 20)
+    DilateMaps(inStrips, None, 4, stripHeight=7)
+    np.testing.assert_array_equal(inStrips, colorMap)
+
+def testNormalsAreFilledAndRenormalized():
+    colorMap, covered = BlobMaps(seed=2)
+    normalMap = np.zeros(colorMap.shape[:2] + (3,), dtype=np.uint8)
+    normalMap[covered] = (200, 128, 200) #Not unit length once decoded
+    DilateMaps(colorMap, normalMap, 3)
+    filled = (colorMap[:, :, 0] >= 0) & ~covered
+    decoded = normalMap[filled].astype(np.float32) / 255.0 * 2.0 - 1.0
+    np.testing.assert_allclose(np.linalg.norm(decoded, axis=1), 1.0, atol=0.02)
@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import io
+import json
+import struct
+
+import numpy as np
+from PIL import Image
+
+from MeshSnapshot import MeshSnapshot
+
+OBJ = """mtllib box.mtl
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+v 2 0 0
+vt 0 0
+vt 1 0
+vt 1 1
+vt 0 1
+vn 0 0 1
+usemtl painted
+f 1/1/1 2/2/1 3/3/1 4/4/1
+usemtl plain
+f -4/-3/-1 5/2/1 -3/-2/-1
+"""
+
+MTL = """newmtl painted
+Kd 0.2 0.4 0.6
+map_Kd textures/color.png
+norm textures/normal.png
+newmtl plain
+Kd 1 0 0
+"""
+
+def PngBytes(color, size=4):
+    file = io.BytesIO()
+    Image.fromarray(np.tile(np.array(color, dtype=np.uint8), (size, size, 1))).save(file, "PNG")
+    return file.getvalue()
+
+def Pad(data, padding=b"\x00"):
+    return data + padding * (-len(data) % 4)
+
+def QuadGltf(image=None):
+    #Two nodes sharing one textured quad mesh, the second moved along x, with the image stored in the binary buffer when given
+    positions = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=np.float32)
+    uvs = np.array([[0, 1], [1, 1], [1, 0], [0, 0]], dtype=np.float32)
+    indices = np.array([0, 1, 2, 0, 2, 3], dtype=np.uint16)
+    buffer = b""
+    bufferViews = []
+    for data in (positions.tobytes(), uvs.tobytes(), indices.tobytes()) + ((image,) if image else ()):
+        bufferViews.append({"buffer": 0, "byteOffset": len(buffer), "byteLength": len(data)})
+        buffer = Pad(buffer + data)
+    return {
+        "asset": {"version": "2.0"}, "scene": 0, "scenes": [{"nodes": [0, 1]}],
+        "nodes": [{"name": "left", "mesh": 0}, {"name": "right", "mesh": 0, "translation": [2, 0, 0]}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0, "TEXCOORD_0": 1}, "indices": 2, "material": 0}]}],
+        "materials": [{"name": "red", "pbrMetallicRoughness": {"baseColorTexture": {"index": 0}} if image else {}}],
+        "textures": [{"source": 0}] if image else [], "images": [{"bufferView": 3, "mimeType": "image/png"}] if image else [],
+        "accessors": [{"bufferView": 0, "componentType": 5126, "count": 4, "type": "VEC3"}, {"bufferView": 1, "componentType": 5126, "count": 4, "type": "VEC2"},
+                      {"bufferView": 2, "componentType": 5123, "count": 6, "type": "SCALAR"}],
+        "bufferViews": bufferViews, "buffers": [{"byteLength": len(buffer)}],
+    }, buffer
+
+def WriteGlb(path, document, buffer):
+    jsonChunk = Pad(json.dumps(document).encode(), b" ")
+    chunks = struct.pack("<I4s", len(jsonChunk), b"JSON") + jsonChunk + struct.pack("<I4s", len(buffer), b"BIN\x00") + buffer
+    path.write_bytes(b"glTF" + struct.pack("<II", 2, 12 + len(chunks)) + chunks)
+
+def testObjLoading(tmp_path):
+    (tmp_path / "box.obj").write_text(OBJ)
+    (tmp_path / "box.mtl").write_text(MTL)
+    mesh = MeshSnapshot.FromFile(str(tmp_path / "box.obj"))
+    np.testing.assert_array_equal(mesh.faceVertexCounts, [4, 3])
+    np.testing.assert_array_equal(mesh.faceVertexIds, [0, 1, 2, 3, 1, 4, 2]) #Negative indices count back from the last vertex
+    np.testing.assert_array_equal(mesh.faceVertexUVIds, [0, 1, 2, 3, 1, 1, 2])
+    np.testing.assert_array_equal(mesh.materialIds, [0, 1])
+    name, color, colorTexture, normalTexture = mesh.materials[0]
+    assert (name, color) == ("painted", (0.2, 0.4, 0.6))
+    assert colorTexture == str(tmp_path / "textures" / "color.png") and normalTexture == str(tmp_path / "textures" / "normal.png")
+    assert mesh.materials[1] == ("plain", (1.0, 0.0, 0.0), "", "")
+    assert len(mesh.triangleFaceVertices) == 3
+    np.testing.assert_allclose(mesh.normals, np.tile([0.0, 0.0, 1.0], (7, 1)))
+
+def testObjRoundTrip(tmp_path):
+    (tmp_path / "box.obj").write_text(OBJ)
+    (tmp_path / "box.mtl").write_text(MTL)
+    mesh = MeshSnapshot.FromFile(str(tmp_path / "box.obj"))
+    mesh.SaveObj(str(tmp_path / "copy.obj"))
+    copy = MeshSnapshot.FromFile(str(tmp_path / "copy.obj"))
+    for name in ("positions", "faceVertexCounts", "faceVertexIds", "uvs", "faceVertexUVIds", "materialIds", "normals"):
+        np.testing.assert_allclose(getattr(copy, name), getattr(mesh, name))
+    assert copy.materials == mesh.materials
+
+def testGltfMeshesStaySeparate(tmp_path):
+    document, buffer = QuadGltf()
+    document["buffers"][0]["uri"] = "data:application/octet-stream;base64," + base64.b64encode(buffer).decode()
+    (tmp_path / "quads.gltf").write_text(json.dumps(document))
+    meshes = MeshSnapshot.FromGltfMeshes(str(tmp_path / "quads.gltf"))
+    assert [name for name, mesh in meshes] == ["left", "right"]
+    np.testing.assert_allclose(meshes[1][1].positions - meshes[0][1].positions, np.tile([2.0, 0.0, 0.0], (4, 1))) #Node transforms are applied
+    np.testing.assert_allclose(meshes[0][1].TriangleUVs()[0], [[0, 0], [1, 0], [1, 1]]) #glTF v runs top to bottom
+
+    combined = MeshSnapshot.FromFile(str(tmp_path / "quads.gltf"))
+    assert len(combined.faceVertexCounts) == 4 and len(combined.materials) == 1
+
+def testGlbEmbeddedImagesAreDecoded(tmp_path):
+    document, buffer = QuadGltf(PngBytes((255, 0, 0)))
+    WriteGlb(tmp_path / "quads.glb", document, buffer)
+    mesh = MeshSnapshot.FromFile(str(tmp_path / "quads.glb"))
+    colorTexture = mesh.materials[0][2]
+    assert colorTexture in mesh.embeddedImages
+    textures = mesh.LoadMaterialTextures()
+    np.testing.assert_array_equal(textures[0].colorMap, np.tile(np.array([255, 0, 0], dtype=np.uint8), (4, 4, 1)))
+
+    #Embedded images survive a snapshot round trip and count towards its hash
+    mesh.Save(str(tmp_path / "quads.npz"))
+    assert MeshSnapshot.Load(str(tmp_path / "quads.npz")).embeddedImages == mesh.embeddedImages
+    hashes = []
+    for color in ((255, 0, 0), (0, 255, 0)):
+        document, buffer = QuadGltf(PngBytes(color))
+        WriteGlb(tmp_path / "quads.glb", document, buffer)
+        hasher = hashlib.sha256()
+        MeshSnapshot.FromFile(str(tmp_path / "quads.glb")).Hash(hasher)
+        hashes.append(hasher.hexdigest())
+    assert hashes[0] != hashes[1]
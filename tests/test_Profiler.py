@@ -0,0 +1,29 @@
+import tracemalloc
+
+import numpy as np
+
+from Profiler import Profiler
+
+def testAllocationsAreOnlyTrackedWhenAsked():
+    profiler = Profiler()
+    with profiler.Stage("untracked"):
+        pass
+    assert not tracemalloc.is_tracing() and "peakAllocatedBytes" not in profiler.stages[0]
+
+    profiler = Profiler(trackAllocations=True)
+    with profiler.Stage("tracked"):
+        array = np.ones(1 << 20)
+    assert profiler.stages[0]["peakAllocatedBytes"] >= array.nbytes
+    profiler.Stop()
+    assert not tracemalloc.is_tracing()
+
+def testStopLeavesTracingItDidNotStartRunning():
+    tracemalloc.start()
+    try:
+        profiler = Profiler(trackAllocations=True)
+        with profiler.Stage("tracked"):
+            pass
+        profiler.Stop()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,124 @@
+import os
+import struct
+
+import numpy as np
+
+from TextureEncoder import EncodeBC1, EncodeBC4, EncodeBlocks, WriteOutputs
+
+def DecodeBC1(blocks): #(N, 8) BC1 blocks -> (N, 16, 3) uint8 colors, the reference four color mode decode
+    words = blocks.view("<u2").reshape(-1, 4).astype(np.int32)
+    indices = blocks.view("<u4").reshape(-1, 2)[:, 1].astype(np.int64)
+    palette = np.empty((len(blocks), 4, 3))
+    for endpoint, word in enumerate((words[:, 0], words[:, 1])):
+        palette[:, endpoint] = np.stack((((word >> 11) & 31) * 255 / 31, ((word >> 5) & 63) * 255 / 63, (word & 31) * 255 / 31), axis=-1)
+    palette[:, 2] = (2 * palette[:, 0] + palette[:, 1]) / 3
+    palette[:, 3] = (palette[:, 0] + 2 * palette[:, 1]) / 3
+    texelIndices = (indices[:, None] >> (2 * np.arange(16))) & 3
+    assert np.all((words[:, 0] > words[:, 1]) | (texelIndices == 0).all(axis=1)) #Never relies on the three color mode
+    return np.rint(np.take_along_axis(palette, texelIndices[:, :, None], axis=1)).astype(np.uint8)
+
+def DecodeBC4(blocks): #(N, 8) BC4 blocks -> (N, 16) uint8 values
+    value0 = blocks[:, 0].astype(np.float64)
+    value1 = blocks[:, 1].astype(np.float64)
+    palette = np.empty((len(blocks), 8))
+    palette[:, 0] = value0
+    palette[:, 1] = value1
+    assert np.all(value0 >= value1) #Never relies on the six value mode
+    for step in range(1, 7):
+        palette[:, step + 1] = ((7 - step) * value0 + step * value1) / 7
+    bits = np.zeros(len(blocks), dtype=np.uint64)
+    for byte in range(6):
+        bits |= blocks[:, 2 + byte].astype(np.uint64) << np.uint64(8 * byte)
+    texelIndices = ((bits[:, None] >> (np.uint64(3) * np.arange(16, dtype=np.uint64))) & np.uint64(7)).astype(np.int64)
+    return np.rint(np.take_along_axis(palette, texelIndices, axis=1)).astype(np.uint8)
+
+def testBC1RoundTrip():
+    rng = np.random.default_rng(0)
+    #Two color blocks land exactly on their quantized endpoints, gradients along one axis stay close
+    endpoints = rng.integers(0, 256, (64, 2, 3))
+    twoColor = endpoints[np.arange(64)[:, None], rng.integers(0, 2, (64, 16))].astype(np.uint8)
+    decoded = DecodeBC1(EncodeBC1(twoColor)).astype(np.int32)
+    assert np.abs(decoded - twoColor).max() <= 4 #5:6:5 endpoint rounding
+
+    ramp = np.linspace(0, 1, 16)[None, :, None]
+    start = rng.integers(0, 128, (64, 1, 3))
+    gradients = (start + ramp * rng.integers(0, 128, (64, 1, 3))).astype(np.uint8)
+    decoded = DecodeBC1(EncodeBC1(gradients)).astype(np.int32)
+    span = gradients.max(axis=1).astype(np.int32) - gradients.min(axis=1) #Four palette steps are at most span / 6 away, plus endpoint rounding
+    assert np.all(np.abs(decoded - gradients).max(axis=1) <= span / 6.0 + 5)
+
+    solid = np.full((1, 16, 3), 77, dtype=np.uint8)
+    assert np.abs(DecodeBC1(EncodeBC1(solid)).astype(np.int32) - 77).max() <= 4
+
+def testBC4RoundTrip():
+    rng = np.random.default_rng(1)
+    values = rng.integers(0, 256, (256, 16)).astype(np.uint8)
+    values[:8] = 99 #Flat blocks
+    decoded = DecodeBC4(EncodeBC4(values)).astype(np.int32)
+    span = values.max(axis=1).astype(np.int32) - values.min(axis=1)
+    assert np.all(np.abs(decoded - values).max(axis=1) <= span / 14.0 + 1)
+    np.testing.assert_array_equal(decoded[:8], 99)
+
+def testBC5RoundTrip():
+    rng = np.random.default_rng(2)
+    normals = rng.integers(0, 256, (8, 8, 3)).astype(np.uint8)
+    blocks = EncodeBlocks(normals, "bc5")
+    assert blocks.shape == (4, 16)
+    texels = normals.reshape(2, 4, 2, 4, 3).transpose(0, 2, 1, 3, 4).reshape(-1, 16, 3).astype(np.int32) #Row of blocks by row of blocks
+    for channel in (0, 1):
+        decoded = DecodeBC4(np.ascontiguousarray(blocks[:, 8 * channel:8 * channel + 8])).astype(np.int32)
+        span = texels[:, :, channel].max(axis=1) - texels[:, :, channel].min(axis=1)
+        assert np.all(np.abs(decoded - texels[:, :, channel]).max(axis=1) <= span / 14.0 + 1)
+
+def LevelBytes(width, height, blockBytes):
+    return max((width + 3) // 4, 1) * max((height + 3) // 4, 1) * blockBytes
+
+def Mips(width, height):
+    levels = [(width, height)]
+    while levels[-1] != (1, 1):
+        levels.append((max(levels[-1][0] // 2, 1), max(levels[-1][1] // 2, 1)))
+    return levels
+
+def WriteTestOutputs(directory, outputFormat, width=16, height=8):
+    rng = np.random.default_rng(3)
+    color = rng.integers(0, 256, (height, width, 4)).astype(np.uint8)
+    normal = rng.integers(0, 256, (height, width, 3)).astype(np.uint8)
+    WriteOutputs(str(directory), "test", color, normal, outputFormat)
+    return color, [os.path.join(directory, f"test_{kind}.{outputFormat}") for kind in ("color", "normal")]
+
+def testDdsLayout(tmp_path):
+    color, paths = WriteTestOutputs(tmp_path, "dds")
+    levels = Mips(16, 8)
+    for path, (blockBytes, dxgiFormat) in zip(paths, ((8, 72), (16, 83))):
+        with open(path, "rb") as file:
+            data = file.read()
+        assert data[:4] == b"DDS "
+        headerSize, flags, height, width, linearSize, depth, mipCount = struct.unpack_from("<7I", data, 4)
+        assert (headerSize, height, width, mipCount) == (124, 8, 16, len(levels))
+        assert linearSize == LevelBytes(16, 8, blockBytes)
+        assert struct.unpack_from("<4s", data, 84)[0] == b"DX10"
+        assert struct.unpack_from("<5I", data, 128)[:2] == (dxgiFormat, 3)
+        assert len(data) == 148 + sum(LevelBytes(width, height, blockBytes) for width, height in levels)
+    with open(paths[0], "rb") as file: #The first level is the full size image, row of blocks by row of blocks
+        blocks = np.frombuffer(file.read(), dtype=np.uint8, offset=148, count=LevelBytes(16, 8, 8)).reshape(-1, 8)
+    texels = color[:, :, :3].reshape(2, 4, 4, 4, 3).transpose(0, 2, 1, 3, 4).reshape(-1, 16, 3)
+    np.testing.assert_array_equal(DecodeBC1(blocks.copy()), DecodeBC1(EncodeBC1(texels)))
+
+def testKtx2Layout(tmp_path):
+    color, paths = WriteTestOutputs(tmp_path, "ktx2")
+    levels = Mips(16, 8)
+    for path, (blockBytes, vkFormat) in zip(paths, ((8, 132), (16, 141))):
+        with open(path, "rb") as file:
+            data = file.read()
+        assert data[:12] == b"\xabKTX 20\xbb\r\n\x1a\n"
+        format, typeSize, width, height, depth, layers, faces, levelCount, supercompression = struct.unpack_from("<9I", data, 12)
+        assert (format, width, height, levelCount, supercompression) == (vkFormat, 16, 8, len(levels), 0)
+        descriptorOffset, descriptorLength = struct.unpack_from("<2I", data, 48)
+        assert struct.unpack_from("<I", data, descriptorOffset)[0] == descriptorLength
+        offsets = []
+        for level, (levelWidth, levelHeight) in enumerate(levels):
+            offset, length, uncompressedLength = struct.unpack_from("<3Q", data, 80 + 24 * level)
+            assert length == uncompressedLength == LevelBytes(levelWidth, levelHeight, blockBytes)
+            assert offset % blockBytes == 0 and offset + length <= len(data)
+            offsets.append(offset)
+        assert offsets == sorted(offsets, reverse=True) #Smallest mip first in the file
@@ -0,0 +1,40 @@
+import numpy as np
+
+from TextureTransfer import FLAT_NORMAL, MaterialTextures, TransferTextures
+
+#Unit square in the xy plane whose source uvs match its positions, split into two triangles
+POSITIONS = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0]])
+TRIANGLES = np.array([[0, 1, 2], [0, 2, 3]])
+SOURCE_UVS = POSITIONS[TRIANGLES][:, :, :2]
+
+def RandomImage(size, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+
+def Transfer(targetUVs, image, superSampling=1):
+    materials = [MaterialTextures("material", colorMap=image)]
+    return TransferTextures(POSITIONS, TRIANGLES, SOURCE_UVS, targetUVs, np.zeros(len(TRIANGLES)), materials, image.shape[1], image.shape[0], superSampling=superSampling)
+
+def testIdentityLayoutCopiesEveryTexel():
+    image = RandomImage(16)
+    colorMap, normalMap = Transfer(SOURCE_UVS, image)
+    assert np.all(colorMap[:, :, 3] == 1.0)
+    np.testing.assert_allclose(colorMap[:, :, :3] * 255.0, image, atol=1e-3)
+    np.testing.assert_allclose(normalMap * 2.0 - 1.0, np.broadcast_to(FLAT_NORMAL, normalMap.shape), atol=1e-5)
+
+def testRotatedLayoutRotatesTheTexture():
+    image = RandomImage(16, seed=1)
+    rotatedUVs = np.stack((1.0 - SOURCE_UVS[:, :, 1], SOURCE_UVS[:, :, 0]), axis=-1) #Quarter turn counterclockwise around the uv center
+    colorMap, normalMap = Transfer(rotatedUVs, image)
+    np.testing.assert_allclose(colorMap[:, :, :3] * 255.0, np.rot90(image), atol=1e-3)
+    np.testing.assert_allclose(normalMap * 2.0 - 1.0, np.broadcast_to(FLAT_NORMAL, normalMap.shape), atol=1e-5) #Flat normals stay flat in any tangent frame
+
+def testWindowsMatchTheWholeMap():
+    image = RandomImage(32, seed=2)
+    rotatedUVs = np.stack((1.0 - SOURCE_UVS[:, :, 1], SOURCE_UVS[:, :, 0]), axis=-1)
+    colorMap, normalMap = Transfer(rotatedUVs, image, superSampling=3)
+    materials = [MaterialTextures("material", colorMap=image)]
+    for window in ((0, 0, 16, 16), (16, 0, 32, 16), (0, 16, 16, 32), (16, 16, 32, 32)):
+        x0, y0, x1, y1 = window
+        colorTile, normalTile = TransferTextures(POSITIONS, TRIANGLES, SOURCE_UVS, rotatedUVs, np.zeros(len(TRIANGLES)), materials, 32, 32, window, superSampling=3)
+        np.testing.assert_array_equal(colorTile, colorMap[y0:y1, x0:x1])
+        np.testing.assert_array_equal(normalTile, normalMap[y0:y1, x0:x1])
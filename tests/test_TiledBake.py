@@ -0,0 +1,28 @@
+import pytest
+
+from Benchmark import SyntheticMesh
+from ImageIO import ReadImage
+from TextureBaker import BakeSnapshot
+from UVAtlas import GenerateAtlas
+
+@pytest.fixture(scope="module")
+def meshes(tmp_path_factory):
+    source = SyntheticMesh(2000, 2, str(tmp_path_factory.mktemp("textures")), textureSize=64)
+    uvs, uvIds = GenerateAtlas(source.positions, source.faceVertexCounts, source.faceVertexIds, 128, 2, triangleFaceVertices=source.triangleFaceVertices)
+    return source, source.WithUVs(uvs, uvIds)
+
+def Bake(meshes, directory, tileSize, workerCount=None, normalBitDepth=8, progress=None):
+    directory.mkdir()
+    source, target = meshes
+    BakeSnapshot(source, target, 128, str(directory), "bake", tileSize, workerCount, dilation=4, superSampling=2, progress=progress, normalBitDepth=normalBitDepth)
+    return [(directory / f"bake_{kind}.png").read_bytes() for kind in ("color", "normal")] #Pillow reads 16-bit RGB back as 8-bit, the written bytes keep every bit
+
+@pytest.mark.parametrize("workerCount, normalBitDepth", [(1, 8), (2, 8), (2, 16)])
+def testTiledBakeMatchesUntiledBake(meshes, tmp_path, workerCount, normalBitDepth):
+    outputs = Bake(meshes, tmp_path / "untiled", 0, normalBitDepth=normalBitDepth)
+    assert Bake(meshes, tmp_path / "tiled", 48, workerCount, normalBitDepth) == outputs #Tiles that do not divide the map leave a ragged last row and column
+    assert ReadImage(str(tmp_path / "tiled" / "bake_color.png"))[:, :, 3].any()
+    windows = []
+    assert Bake(meshes, tmp_path / "windowed", 0, normalBitDepth=normalBitDepth, progress=lambda window, colorMap: windows.append(window)) == outputs #The in-memory bake the GUI runs
+    assert windows
+    assert sorted(path.name for path in (tmp_path / "tiled").iterdir()) == ["bake_color.png", "bake_normal.png"] #The scratch memmaps are removed
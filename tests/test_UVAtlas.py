@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from Benchmark import SyntheticMesh
+from UVAtlas import GenerateAtlas, OverlappingFaces
+
+@pytest.fixture(scope="module")
+def mesh(tmp_path_factory): #Bumpy torus of non-planar quads, the case that used to fold charts over
+    return SyntheticMesh(4000, 1, str(tmp_path_factory.mktemp("atlas")), textureSize=16)
+
+def Atlas(mesh, resolution=512):
+    return GenerateAtlas(mesh.positions, mesh.faceVertexCounts, mesh.faceVertexIds, resolution, 4, triangleFaceVertices=mesh.triangleFaceVertices)
+
+def testNoTriangleIsFlippedOrOverlapped(mesh):
+    uvs, uvIds = Atlas(mesh)
+    assert uvs.min() >= 0.0 and uvs.max() <= 1.0
+    triangleUVs = uvs[uvIds[mesh.triangleFaceVertices]]
+    edges1 = triangleUVs[:, 1] - triangleUVs[:, 0]
+    edges2 = triangleUVs[:, 2] - triangleUVs[:, 0]
+    assert np.all(edges1[:, 0] * edges2[:, 1] - edges1[:, 1] * edges2[:, 0] > 0)
+    assert not OverlappingFaces(triangleUVs, mesh.FaceIds()[mesh.triangleFaceVertices[:, 0]], len(mesh.faceVertexCounts), 512).any()
+
+def testLayoutIsDeterministic(mesh):
+    uvs, uvIds = Atlas(mesh)
+    uvsAgain, uvIdsAgain = Atlas(mesh)
+    np.testing.assert_array_equal(uvs, uvsAgain)
+    np.testing.assert_array_equal(uvIds, uvIdsAgain)
+
+def testOverlappingFacesFindsStackedFaces():
+    square = np.array([[[0.1, 0.1], [0.9, 0.1], [0.9, 0.9]], [[0.1, 0.1], [0.9, 0.9], [0.1, 0.9]]])
+    stacked = np.concatenate((square, square + 0.2))
+    overlapping = OverlappingFaces(stacked, np.array([0, 0, 1, 1]), 2, 64)
+    np.testing.assert_array_equal(overlapping, [True, True])
+    assert not OverlappingFaces(square, np.array([0, 0]), 1, 64).any() #Triangles of one face only share an edge
+
+def testPackingSettlesInAFewPacks(mesh, monkeypatch):
+    import UVAtlas
+    calls = {"PackCharts": 0, "PackSkyline": 0}
+    for name in calls:
+        def Counting(*args, original=getattr(UVAtlas, name), name=name):
+            calls[name] += 1
+            return original(*args)
+        monkeypatch.setattr(UVAtlas, name, Counting)
+    uvs, uvIds = Atlas(mesh, 2048)
+    assert calls["PackSkyline"] <= 8 * calls["PackCharts"] #Bisecting took a dozen packs or more for every layout